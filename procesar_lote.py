@@ -0,0 +1,243 @@
+# procesar_lote.py
+"""Procesamiento masivo sin interfaz: Textract -> clasificación -> análisis por modo.
+
+Ejemplos:
+    python procesar_lote.py ./facturas --modo facturas --salida facturas.jsonl
+    python procesar_lote.py s3://mi-bucket/pendientes/ --modo contratos --paralelismo 16 --salida contratos.parquet
+
+Con un origen s3:// Textract lee los PDF desde ese bucket, que debe estar en la
+misma región y permitirle la lectura.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.analisis_documentos import (analizar_documento_por_modo, clasificar_resultados, comparar_proveedores,
+                                       enriquecer_resultado)
+from utils.aws_clients import obtener_cliente
+from utils.comprehend_utils import estadisticas_clasificacion
+from utils.imagen_utils import EXTENSIONES_IMAGEN
+from utils.textract_utils import iterar_archivos_con_textract
+
+EXTENSIONES = ('.pdf',) + EXTENSIONES_IMAGEN
+MODOS = ('general', 'publicidad', 'facturas', 'contratos')
+
+
+class ArchivoLote:
+    """Archivo de entrada abierto recién cuando el pipeline lo lee.
+
+    Expone lo que usa el pipeline (name, size, read, seek, tell) sin mantener
+    abiertos ni en memoria los miles de archivos de un lote nocturno. Los objetos
+    de S3 llevan `s3_origen` (bucket, key, etag): Textract lee los PDF directamente
+    de ahí y solo se descargan si algo necesita los bytes (imágenes, fallback).
+    """
+
+    def __init__(self, name, size, abrir, s3_origen=None):
+        self.name = name
+        self.size = size
+        self.s3_origen = s3_origen
+        self._abrir = abrir
+        self._archivo = None
+
+    def _handle(self):
+        if self._archivo is None:
+            self._archivo = self._abrir()
+        return self._archivo
+
+    def read(self, *args):
+        return self._handle().read(*args)
+
+    def seek(self, *args):
+        return self._handle().seek(*args)
+
+    def tell(self):
+        return self._handle().tell()
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+def listar_locales(directorio):
+    archivos = []
+    for raiz, _, nombres in os.walk(directorio):
+        for nombre in sorted(nombres):
+            if nombre.lower().endswith(EXTENSIONES):
+                ruta = os.path.join(raiz, nombre)
+                archivos.append(ArchivoLote(nombre, os.path.getsize(ruta), lambda ruta=ruta: open(ruta, 'rb')))
+    return archivos
+
+
+def listar_s3(uri):
+    bucket, _, prefijo = uri[len('s3://'):].partition('/')
+    s3 = obtener_cliente('s3')
+
+    def descargar(key):
+        return io.BytesIO(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+    archivos = []
+    for pagina in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefijo):
+        for objeto in pagina.get('Contents', []):
+            key = objeto['Key']
+            if key.lower().endswith(EXTENSIONES):
+                archivos.append(ArchivoLote(os.path.basename(key), objeto['Size'], lambda key=key: descargar(key),
+                                            s3_origen=(bucket, key, objeto.get('ETag', ''))))
+    return archivos
+
+
+def procesar_y_analizar(modo):
+    """Enriquecimiento del pipeline: Comprehend + métricas + análisis del modo.
+
+    La clasificación queda fuera: main la hace en lote al terminar cada bloque.
+    """
+    def enriquecer(result):
+        result = enriquecer_resultado(result, clasificar=False)
+        result['analisis_especifico'] = analizar_documento_por_modo(result, modo)
+        return result
+    return enriquecer
+
+
+def registro_salida(result, modo):
+    """Fila serializable por documento (sin DataFrames ni bloques)"""
+    planificacion = result.get('planificacion', {})
+    return {
+        'filename': result.get('filename'),
+        'modo': modo,
+        'pages': result.get('pages', 1),
+        'text': result.get('text', ''),
+        'tablas': [{'filas': t.filas, 'columnas': t.columnas, 'celdas': t.a_json()['celdas']}
+                   for t in result.get('tables', []) if hasattr(t, 'a_json')],
+        'forms': result.get('forms', {}),
+        'features': result.get('features'),
+        'clasificacion': (result.get('comprehend_analysis') or {}).get('clasificacion_documento'),
+        'sentiment': (result.get('comprehend_analysis') or {}).get('sentiment'),
+        'analisis_especifico': result.get('analisis_especifico'),
+        'latencia_s': planificacion.get('servicio'),
+        'espera_cola_s': planificacion.get('espera_cola'),
+    }
+
+
+class EscritorSalida:
+    """JSONL escrito a medida que termina cada bloque de documentos, o Parquet al final"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.parquet = ruta.lower().endswith('.parquet')
+        self._filas = []
+        self._jsonl = None if self.parquet else open(ruta, 'w', encoding='utf-8')
+
+    def escribir(self, fila):
+        if self.parquet:
+            self._filas.append(fila)
+        else:
+            self._jsonl.write(json.dumps(fila, ensure_ascii=False, default=str) + '\n')
+
+    def cerrar(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            return
+        import pandas as pd
+
+        # Columnas anidadas como JSON: el esquema de Parquet no admite dicts heterogéneos
+        df = pd.DataFrame(self._filas)
+        for columna in ('tablas', 'forms', 'features', 'clasificacion', 'analisis_especifico'):
+            if columna in df:
+                df[columna] = df[columna].map(lambda valor: json.dumps(valor, ensure_ascii=False, default=str))
+        df.to_parquet(self.ruta, index=False)
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesamiento masivo de documentos con Textract")
+    parser.add_argument('origen', help="Directorio local o prefijo s3://bucket/prefijo/")
+    parser.add_argument('--modo', choices=MODOS, default='general')
+    parser.add_argument('--salida', default='resultados.jsonl', help="Archivo .jsonl o .parquet")
+    parser.add_argument('--paralelismo', type=int, default=None, help="Documentos en vuelo (PIPELINE_MAX_EN_VUELO)")
+    parser.add_argument('--tamano-bloque', type=int, default=200,
+                        help="Documentos por pipeline; acota archivos abiertos y memoria")
+    args = parser.parse_args(argv)
+
+    if args.salida.lower().endswith('.parquet') and importlib.util.find_spec('pyarrow') is None:
+        # Se comprueba antes de procesar: EscritorSalida escribe el Parquet recién al final
+        print("La salida .parquet requiere pyarrow (pip install pyarrow); use una salida .jsonl o instálelo")
+        return 1
+
+    archivos = listar_s3(args.origen) if args.origen.startswith('s3://') else listar_locales(args.origen)
+    if not archivos:
+        print(f"No hay documentos ({', '.join(EXTENSIONES)}) en {args.origen}")
+        return 1
+
+    escritor = EscritorSalida(args.salida)
+    enriquecer = procesar_y_analizar(args.modo)
+    latencias = []
+    paginas = 0
+    errores = 0
+    proveedores = []
+    hechos = 0
+    inicio = time.perf_counter()
+
+    try:
+        for desde in range(0, len(archivos), args.tamano_bloque):
+            bloque = archivos[desde:desde + args.tamano_bloque]
+            resultados = []
+            for idx, result in iterar_archivos_con_textract(bloque, max_en_vuelo=args.paralelismo,
+                                                            enriquecer=enriquecer, modo=args.modo):
+                bloque[idx].cerrar()
+                resultados.append(result)
+                hechos += 1
+                print(f"\r{hechos}/{len(archivos)} documentos", end='', file=sys.stderr, flush=True)
+
+            # Clasificación del bloque en lote, fuera del pipeline
+            clasificar_resultados(resultados)
+            for result in resultados:
+                fila = registro_salida(result, args.modo)
+                escritor.escribir(fila)
+                paginas += fila['pages'] or 1
+                if fila['latencia_s'] is not None:
+                    latencias.append(fila['latencia_s'])
+                if (fila['text'] or '').startswith('Error procesando archivo'):
+                    errores += 1
+                analisis = fila['analisis_especifico']
+                if args.modo == 'facturas' and analisis and (fila['text'] or '').strip():
+                    proveedores.append(analisis['proveedor'])
+    finally:
+        escritor.cerrar()
+        for archivo in archivos:
+            archivo.cerrar()
+    print(file=sys.stderr)
+
+    if args.modo == 'facturas':
+        ruta_comparacion = os.path.splitext(args.salida)[0] + '.comparacion.json'
+        with open(ruta_comparacion, 'w', encoding='utf-8') as f:
+            json.dump(comparar_proveedores(proveedores), f, ensure_ascii=False, indent=2, default=str)
+        print(f"Comparación de proveedores: {ruta_comparacion}")
+
+    segundos = time.perf_counter() - inicio
+    total = len(archivos)
+    print(f"Documentos: {total} ({errores} con error) · páginas: {paginas} · tiempo: {segundos:.1f}s")
+    print(f"Throughput: {total / segundos:.2f} docs/s · {paginas / segundos:.2f} páginas/s")
+    print(f"Latencia por documento: p50 {percentil(latencias, 50):.2f}s · p95 {percentil(latencias, 95):.2f}s")
+    clasificacion = estadisticas_clasificacion()
+    print(f"Clasificación sin llamar a Comprehend: {clasificacion['porcentaje_sin_red']:.0f}% "
+          f"· por método: {clasificacion['por_metodo']}")
+    print(f"Salida: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
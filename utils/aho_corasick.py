@@ -0,0 +1,124 @@
+# utils/aho_corasick.py
+import re
+from collections import deque
+
+
+def _regex_trie(nodo):
+    """Expresión regular con la forma del trie (prefijos comunes factorizados)"""
+    alternativas = []
+    terminal = False
+    for caracter, hijo in nodo.items():
+        if caracter is None:
+            terminal = True
+        else:
+            alternativas.append(re.escape(caracter) + _regex_trie(hijo))
+    if not alternativas:
+        return ''
+    patron = alternativas[0] if len(alternativas) == 1 and not terminal else '(?:' + '|'.join(alternativas) + ')'
+    return patron + '?' if terminal else patron
+
+
+class AutomataAhoCorasick:
+    """Autómata de Aho-Corasick para buscar muchas cadenas en una sola pasada.
+
+    Se construye una vez y `buscar` reporta todas las apariciones, incluso
+    solapadas, con su posición. Usa pyahocorasick (extensión en C) si está
+    instalada. Si no, corre un autómata en Python solo sobre las ventanas donde
+    el mismo trie, compilado como regex, encuentra el inicio de algún patrón; y
+    `primeras_posiciones` usa str.find por patrón, que en CPython es más rápido
+    que recorrer el texto carácter a carácter en Python.
+    """
+
+    def __init__(self, patrones):
+        self.patrones = list(dict.fromkeys(p for p in patrones if p))
+        self.longitud_maxima = max((len(p) for p in self.patrones), default=0)
+        self._automata_c = None
+        try:
+            import ahocorasick
+        except ImportError:
+            ahocorasick = None
+        if ahocorasick is not None and self.patrones:
+            self._automata_c = ahocorasick.Automaton()
+            for patron in self.patrones:
+                self._automata_c.add_word(patron, patron)
+            self._automata_c.make_automaton()
+            return
+
+        # Trie: transiciones por estado y patrones que terminan en cada estado
+        self._goto = [{}]
+        self._salidas = [[]]
+        trie = {}
+        for patron in self.patrones:
+            estado = 0
+            nodo = trie
+            for caracter in patron:
+                siguiente = self._goto[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = self._goto[estado][caracter] = len(self._goto)
+                    self._goto.append({})
+                    self._salidas.append([])
+                estado = siguiente
+                nodo = nodo.setdefault(caracter, {})
+            self._salidas[estado].append(patron)
+            nodo[None] = True
+
+        # Enlaces de fallo por BFS; cada estado hereda las salidas de su sufijo
+        self._fallo = [0] * len(self._goto)
+        cola = deque(self._goto[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._goto[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._goto[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._goto[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._salidas[siguiente] = self._salidas[siguiente] + self._salidas[self._fallo[siguiente]]
+
+        self._prefiltro = re.compile(_regex_trie(trie)) if self.patrones else None
+
+    def _recorrer(self, texto, inicio, fin):
+        goto, fallo, salidas = self._goto, self._fallo, self._salidas
+        estado = 0
+        for posicion in range(inicio, fin):
+            caracter = texto[posicion]
+            while estado and caracter not in goto[estado]:
+                estado = fallo[estado]
+            estado = goto[estado].get(caracter, 0)
+            for patron in salidas[estado]:
+                yield posicion - len(patron) + 1, patron
+
+    def buscar(self, texto):
+        """Genera (posición, patrón) por cada aparición, en orden de fin"""
+        if self._automata_c is not None:
+            for fin, patron in self._automata_c.iter(texto):
+                yield fin - len(patron) + 1, patron
+            return
+        if self._prefiltro is None:
+            return
+        # Toda aparición empieza dentro de un match del prefiltro y termina a lo
+        # sumo longitud_maxima - 1 caracteres después: ventanas disjuntas
+        inicio_ventana = fin_ventana = 0
+        for match in self._prefiltro.finditer(texto):
+            if match.start() >= fin_ventana:
+                if fin_ventana:
+                    yield from self._recorrer(texto, inicio_ventana, fin_ventana)
+                inicio_ventana = match.start()
+            fin_ventana = min(len(texto), max(fin_ventana, match.end() + self.longitud_maxima - 1))
+        if fin_ventana:
+            yield from self._recorrer(texto, inicio_ventana, fin_ventana)
+
+    def primeras_posiciones(self, texto):
+        """{patrón: posición de su primera aparición} de los patrones presentes"""
+        posiciones = {}
+        if self._automata_c is None:
+            for patron in self.patrones:
+                posicion = texto.find(patron)
+                if posicion >= 0:
+                    posiciones[patron] = posicion
+            return posiciones
+        for posicion, patron in self.buscar(texto):
+            if patron not in posiciones or posicion < posiciones[patron]:
+                posiciones[patron] = posicion
+        return posiciones
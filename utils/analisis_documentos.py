@@ -0,0 +1,882 @@
+# utils/analisis_documentos.py
+"""Análisis específico por modo (publicidad, facturas, contratos) y enriquecimiento
+de resultados. Sin dependencias de Streamlit: lo usan app.py y procesar_lote.py."""
+import os
+import re
+
+from utils.aws_clients import obtener_cliente
+from utils.aws_resiliencia import llamar_aws
+from utils.comprehend_utils import clasificar_multiple_textos, clasificar_texto
+from utils.textract_utils import extract_tables_from_result
+
+# Documentos por llamada a clasificar_lote al clasificar un lote ya procesado
+CLASIFICACION_TAMANO_GRUPO = int(os.getenv("CLASIFICACION_TAMANO_GRUPO", "100"))
+
+# ============================================
+# FUNCIONES ESPECÍFICAS PARA CASOS DE USO DEL CLIENTE
+# ============================================
+
+def procesar_ordenes_publicitarias(results):
+    """Procesa específicamente órdenes publicitarias de agencias"""
+    ordenes_procesadas = []
+    
+    for result in results:
+        texto = result.get('text', '')
+        if not texto:
+            continue
+            
+        # Extraer información específica de órdenes publicitarias
+        orden_info = {
+            'agencia': extraer_nombre_agencia(texto),
+            'cliente': extraer_cliente_publicidad(texto),
+            'medio': extraer_medio_publicitario(texto),
+            'spots': extraer_cantidad_spots(texto),
+            'frecuencia': extraer_frecuencia(texto),
+            'bloques_horarios': extraer_bloques_horarios(texto),
+            'duracion': extraer_duracion_spots(texto),
+            'fechas': extraer_rango_fechas(texto),
+            'inversion': extraer_inversion(texto)
+        }
+        
+        ordenes_procesadas.append(orden_info)
+    
+    return ordenes_procesadas
+
+def extraer_nombre_agencia(texto):
+    """Extrae nombre de la agencia publicitaria"""
+    patrones = [
+        r'Agencia[:\s]*([^\n]+)',
+        r'AGENCIA[:\s]*([^\n]+)',
+        r'Publicidad\s+([^\n]+)',
+        r'Mediakit\s+([^\n]+)'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return "No detectado"
+
+def extraer_cliente_publicidad(texto):
+    """Extrae nombre del cliente de la publicidad"""
+    patrones = [
+        r'Cliente[:\s]*([^\n]+)',
+        r'Anunciante[:\s]*([^\n]+)',
+        r'MARCA[:\s]*([^\n]+)',
+        r'Producto[:\s]*([^\n]+)'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+    return "No detectado"
+
+def extraer_medio_publicitario(texto):
+    """Identifica el medio publicitario (radio, TV, etc.)"""
+    medios = {
+        'radio': ['radio', 'emisora', 'frecuencia', 'AM', 'FM'],
+        'tv': ['televisión', 'television', 'canal', 'TV'],
+        'digital': ['digital', 'web', 'online', 'streaming'],
+        'prensa': ['periódico', 'periodico', 'diario', 'prensa']
+    }
+    
+    texto_lower = texto.lower()
+    for medio, palabras in medios.items():
+        if any(palabra in texto_lower for palabra in palabras):
+            return medio
+    return "No especificado"
+
+def extraer_cantidad_spots(texto):
+    """Extrae cantidad de spots publicitarios"""
+    patrones = [
+        r'(\d+)\s+spots?',
+        r'spots?[:\s]*(\d+)',
+        r'cantidad[:\s]*(\d+)\s*(?:spots|cuñas)',
+        r'(\d+)\s+cuñas?'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return int(match.group(1))
+    return 0
+
+def extraer_frecuencia(texto):
+    """Extrae frecuencia de emisión"""
+    patrones = [
+        r'frecuencia[:\s]*([^\n]+)',
+        r'(\d+)\s+veces\s+al\s+día',
+        r'(\d+)\s+times\s+per\s+day',
+        r'diario|semanal|mensual'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return match.group(0).strip()
+    return "No especificada"
+
+def extraer_bloques_horarios(texto):
+    """Extrae bloques horarios de emisión"""
+    patron_horario = r'(\d{1,2}:\d{2})\s*(?:a|–|-)\s*(\d{1,2}:\d{2})'
+    matches = re.findall(patron_horario, texto)
+    return [f"{inicio} a {fin}" for inicio, fin in matches]
+
+def extraer_duracion_spots(texto):
+    """Extrae duración de los spots"""
+    patrones = [
+        r'(\d+)\s*segundos?',
+        r'duracion[:\s]*(\d+)\s*s',
+        r'(\d+)\s*"',
+        r'(\d+)\s*seg'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            return f"{match.group(1)} segundos"
+    return "No especificada"
+
+def extraer_rango_fechas(texto):
+    """Extrae rango de fechas de la campaña"""
+    patron_fecha = r'(\d{1,2}/\d{1,2}/\d{4})\s*(?:a|–|-)\s*(\d{1,2}/\d{1,2}/\d{4})'
+    match = re.search(patron_fecha, texto)
+    if match:
+        return f"{match.group(1)} a {match.group(2)}"
+    
+    # Buscar fecha única
+    patron_fecha_unica = r'\d{1,2}/\d{1,2}/\d{4}'
+    fechas = re.findall(patron_fecha_unica, texto)
+    if fechas:
+        return fechas[0]
+    
+    return "No especificada"
+
+def extraer_inversion(texto):
+    """Extrae monto de inversión publicitaria"""
+    patrones = [
+        r'inversión[:\s]*\$?\s*([\d,]+(?:\.\d{2})?)',
+        r'inversion[:\s]*\$?\s*([\d,]+(?:\.\d{2})?)',
+        r'monto[:\s]*\$?\s*([\d,]+(?:\.\d{2})?)',
+        r'total[:\s]*\$?\s*([\d,]+(?:\.\d{2})?)',
+        r'valor[:\s]*\$?\s*([\d,]+(?:\.\d{2})?)'
+    ]
+    
+    for patron in patrones:
+        match = re.search(patron, texto, re.IGNORECASE)
+        if match:
+            try:
+                return float(match.group(1).replace(',', ''))
+            except:
+                return match.group(1)
+    return "No especificado"
+
+# ============================================
+# PROCESAMIENTO DE FACTURAS MEJORADO
+# ============================================
+
+def validar_factura_automatica(provider_info, texto):
+    """Valida factura con reglas específicas del cliente"""
+    validaciones = {
+        'tiene_ruc': provider_info.get('ruc') != 'No detectado',
+        'tiene_fecha': provider_info.get('fecha') != 'No detectada',
+        'tiene_total': provider_info.get('total') != 'No detectado',
+        'es_valida_sunat': validar_estado_sunat(provider_info.get('ruc')),
+        'aplica_retencion': determinar_retencion(provider_info, texto),
+        'aplica_detraccion': determinar_detraccion(provider_info, texto),
+        'igv_correcto': validar_igv(provider_info, texto)
+    }
+    
+    return validaciones
+
+def determinar_retencion(provider_info, texto):
+    """Determina si aplica retención según giro del proveedor"""
+    # Lógica de retención (simplificada)
+    giros_retencion = [
+        'servicios', 'consultoria', 'honorarios', 'alquileres',
+        'publicidad', 'marketing', 'asesoria'
+    ]
+    
+    texto_lower = texto.lower()
+    if any(giro in texto_lower for giro in giros_retencion):
+        return "Sí - 8%"
+    return "No aplica"
+
+def determinar_detraccion(provider_info, texto):
+    """Determina si aplica detracción"""
+    giros_detraccion = [
+        'transporte', 'construccion', 'servicios publicos',
+        'venta combustible', 'venta minerales'
+    ]
+    
+    texto_lower = texto.lower()
+    if any(giro in texto_lower for giro in giros_detraccion):
+        return "Sí - 12%"
+    return "No aplica"
+
+def validar_igv(provider_info, texto):
+    """Valida que el IGV sea correcto"""
+    # Buscar IGV en el texto
+    patron_igv = r'IGV\s*[\(\)\d%\s]*:\s*\$?\s*([\d,]+(?:\.\d{2})?)'
+    match = re.search(patron_igv, texto, re.IGNORECASE)
+    
+    if match and provider_info.get('total'):
+        try:
+            igv_calculado = float(provider_info['total']) * 0.18
+            igv_documento = float(match.group(1).replace(',', ''))
+            # Permitir pequeña diferencia por redondeo
+            return abs(igv_calculado - igv_documento) < 0.5
+        except:
+            return False
+    return True
+
+def validar_estado_sunat(ruc):
+    """Valida estado del RUC en SUNAT (placeholder)"""
+    if ruc and ruc != 'No detectado':
+        return "Válido"  # En producción, integrar con API SUNAT
+    return "No validado"
+
+# ============================================
+# GESTIÓN DE CONTRATOS
+# ============================================
+
+def analizar_contratos(results):
+    """Analiza contratos para área legal"""
+    analisis_contratos = []
+    
+    for result in results:
+        texto = result.get('text', '')
+        if not texto:
+            continue
+            
+        contrato_info = {
+            'partes': extraer_partes_contrato(texto),
+            'fecha_contrato': extraer_fecha_contrato(texto),
+            'vigencia': extraer_vigencia_contrato(texto),
+            'objeto': extraer_objeto_contrato(texto),
+            'obligaciones': extraer_obligaciones_contrato(texto),
+            'penalidades': extraer_penalidades_contrato(texto),
+            'clausulas_importantes': identificar_clausulas_importantes(texto),
+            'estado': 'Por revisar'
+        }
+        
+        analisis_contratos.append(contrato_info)
+    
+    return analisis_contratos
+
+def extraer_partes_contrato(texto):
+    """Extrae las partes del contrato"""
+    patron_partes = [
+        r'ENTRE\s*:([^Y]+)Y\s*:([^,\n]+)',
+        r'CONTRATANTE[:\s]*([^\n]+)\s*CONTRATADO[:\s]*([^\n]+)',
+        r'DE UNA PARTE[:\s]*([^\n]+)\s*DE OTRA PARTE[:\s]*([^\n]+)'
+    ]
+    
+    for patron in patron_partes:
+        match = re.search(patron, texto, re.IGNORECASE | re.DOTALL)
+        if match:
+            parte1 = match.group(1).strip() if match.lastindex >= 1 else ""
+            parte2 = match.group(2).strip() if match.lastindex >= 2 else ""
+            return f"{parte1} - {parte2}"
+    
+    return "No detectadas"
+
+def extraer_fecha_contrato(texto):
+    """Extrae fecha del contrato"""
+    patron_fecha = r'contratado.*?(\d{1,2}/\d{1,2}/\d{4})'
+    match = re.search(patron_fecha, texto, re.IGNORECASE)
+    if match:
+        return match.group(1)
+    return "No detectada"
+
+def extraer_vigencia_contrato(texto):
+    """Extrae vigencia del contrato"""
+    patron_vigencia = r'vigencia.*?(\d+)\s*(días|meses|años)'
+    match = re.search(patron_vigencia, texto, re.IGNORECASE)
+    if match:
+        return f"{match.group(1)} {match.group(2)}"
+    return "No especificada"
+
+def extraer_objeto_contrato(texto):
+    """Extrae objeto del contrato"""
+    patron_objeto = r'OBJETO DEL CONTRATO[:\s]*(.*?)(?=CLÁUSULA|ARTÍCULO|$)' 
+    match = re.search(patron_objeto, texto, re.IGNORECASE | re.DOTALL)
+    if match:
+        return match.group(1).strip()[:200] + "..." if len(match.group(1)) > 200 else match.group(1).strip()
+    return "No detectado"
+
+def extraer_obligaciones_contrato(texto):
+    """Extrae obligaciones principales"""
+    obligaciones = []
+    patron_obligaciones = r'OBLIGACIONES?[:\s]*(.*?)(?=CLÁUSULA|ARTÍCULO|DERECHOS|PENALIDADES)'
+    match = re.search(patron_obligaciones, texto, re.IGNORECASE | re.DOTALL)
+    if match:
+        contenido = match.group(1)
+        # Extraer puntos principales
+        lineas = [line.strip() for line in contenido.split('\n') if len(line.strip()) > 10]
+        obligaciones.extend(lineas[:5])  # Máximo 5 obligaciones
+    return obligaciones
+
+def extraer_penalidades_contrato(texto):
+    """Extrae cláusulas de penalidad"""
+    penalidades = []
+    patron_penalidades = r'PENALIDADES?[:\s]*(.*?)(?=CLÁUSULA|ARTÍCULO|RESOLUCIÓN)'
+    match = re.search(patron_penalidades, texto, re.IGNORECASE | re.DOTALL)
+    if match:
+        contenido = match.group(1)
+        # Buscar montos de penalidad
+        patron_montos = r'(\$?\s*\d+(?:\.\d{2})?)\s*(?:soles|USD|dólares)'
+        montos = re.findall(patron_montos, contenido, re.IGNORECASE)
+        penalidades.extend(montos)
+    return penalidades
+
+def identificar_clausulas_importantes(texto):
+    """Identifica cláusulas importantes"""
+    clausulas_importantes = [
+        'confidencialidad', 'propiedad intelectual', 'terminación',
+        'jurisdicción', 'fuerza mayor', 'garantías', 'indemnización'
+    ]
+    
+    encontradas = []
+    texto_lower = texto.lower()
+    for clausula in clausulas_importantes:
+        if clausula in texto_lower:
+            encontradas.append(clausula)
+    
+    return encontradas
+
+# ============================================
+# FUNCIONES DE ANÁLISIS MEJORADAS CON TEXTRACT
+# ============================================
+
+def extract_products_from_tables(tables_data, provider_name):
+    """Extrae productos de las tablas detectadas por Textract - MEJORADO"""
+    import pandas as pd  # Diferido: no se carga hasta que hay tablas que analizar
+    
+    products = []
+    
+    for table_info in tables_data:
+        df = table_info.dataframe
+        
+        # Buscar columnas que puedan contener productos y precios
+        product_columns = []
+        price_columns = []
+        quantity_columns = []
+        
+        for col in df.columns:
+            col_str = str(col).lower()
+            if any(word in col_str for word in ['producto', 'descripción', 'item', 'concepto', 'servicio']):
+                product_columns.append(col)
+            elif any(word in col_str for word in ['precio', 'importe', 'valor', 'costo', 'unitario']):
+                price_columns.append(col)
+            elif any(word in col_str for word in ['cantidad', 'qty', 'unidades']):
+                quantity_columns.append(col)
+        
+        # Si no encontramos columnas específicas, usar heurísticas
+        if not product_columns:
+            # Buscar columnas con texto que parezcan productos
+            for col in df.columns:
+                sample_values = df[col].dropna().head(3).astype(str)
+                if any(len(str(val)) > 10 and any(char.isalpha() for char in str(val)) for val in sample_values):
+                    product_columns.append(col)
+        
+        if not price_columns:
+            # Buscar columnas con valores numéricos
+            for col in df.columns:
+                try:
+                    numeric_values = pd.to_numeric(df[col].dropna(), errors='coerce')
+                    if numeric_values.notna().sum() > 0:
+                        price_columns.append(col)
+                except:
+                    pass
+        
+        # Extraer productos
+        for product_col in product_columns[:1]:  # Usar solo la primera columna de productos
+            for idx, row in df.iterrows():
+                product_name = str(row[product_col]).strip()
+                if (product_name and 
+                    product_name not in ['', 'nan', 'None'] and 
+                    len(product_name) > 2 and
+                    not any(word in product_name.lower() for word in ['total', 'subtotal', 'igv', 'impuesto'])):
+                    
+                    # Buscar precio
+                    price = None
+                    for price_col in price_columns:
+                        try:
+                            price_val = str(row[price_col]).replace(',', '').replace('S/', '').replace('$', '').strip()
+                            if price_val and price_val not in ['', 'nan', 'None']:
+                                price = float(price_val)
+                                break
+                        except:
+                            continue
+                    
+                    # Buscar cantidad
+                    quantity = None
+                    for qty_col in quantity_columns:
+                        qty_val = str(row[qty_col]).strip()
+                        if qty_val and qty_val not in ['', 'nan', 'None']:
+                            quantity = qty_val
+                            break
+                    
+                    products.append({
+                        'nombre': product_name,
+                        'precio': price,
+                        'cantidad': quantity,
+                        'categoria': categorize_product(product_name),
+                        'proveedor': provider_name,
+                        'fuente': 'tabla'
+                    })
+    
+    return products
+
+def extract_products_from_text(text, provider_name):
+    """Extrae productos del texto usando patrones mejorados"""
+    products = []
+    
+    # Patrones para líneas que parecen productos con precios
+    patterns = [
+        r'([A-Za-z\s\-\&]+)\s+(\d+)[\s,]*(\d+\.\d{2})',  # Producto cantidad precio
+        r'([A-Za-z\s\-\&]+)\s+S\/\.\s*(\d+\.\d{2})',     # Producto S/. precio
+        r'([A-Za-z\s\-\&]+)\s+\$?\s*(\d+[.,]\d{2})',     # Producto $ precio
+    ]
+    
+    for pattern in patterns:
+        matches = re.finditer(pattern, text)
+        for match in matches:
+            product_name = match.group(1).strip()
+            if len(product_name) > 3:  # Filtrar nombres muy cortos
+                price = None
+                quantity = None
+                
+                if len(match.groups()) >= 3:
+                    try:
+                        price = float(match.group(3).replace(',', '.'))
+                        quantity = match.group(2)
+                    except:
+                        pass
+                elif len(match.groups()) >= 2:
+                    try:
+                        price = float(match.group(2).replace(',', '.'))
+                    except:
+                        pass
+                
+                products.append({
+                    'nombre': product_name,
+                    'precio': price,
+                    'cantidad': quantity,
+                    'categoria': categorize_product(product_name),
+                    'proveedor': provider_name,
+                    'fuente': 'texto'
+                })
+    
+    return products
+
+def categorize_product(product_name):
+    """Categoriza productos automáticamente"""
+    product_name_lower = product_name.lower()
+    
+    categorias = {
+        'gaseosas': ['coca', 'pepsi', 'sprite', 'fanta', 'inca', 'cola', 'gaseosa', 'refresco'],
+        'aguas': ['agua', 'cielo', 'cristal', 'mineral', 'aqua'],
+        'cervezas': ['pilsen', 'cristal', 'cusqueña', 'heineken', 'corona', 'cerveza', 'lager'],
+        'jugos': ['jugo', 'néctar', 'refresco', 'pulp', 'zumo'],
+        'lácteos': ['leche', 'yogur', 'queso', 'mantequilla', 'lácteo', 'crema'],
+        'carnes': ['pollo', 'carne', 'pescado', 'res', 'cerdo', 'vacuno', 'filete'],
+        'granos': ['arroz', 'fideo', 'harina', 'maíz', 'trigo', 'avena', 'quinua'],
+        'básicos': ['aceite', 'azúcar', 'sal', 'pan', 'huevo', 'aceituna'],
+        'frutas_verduras': ['fruta', 'verdura', 'legumbre', 'vegetal', 'tomate', 'cebolla'],
+        'limpieza': ['jabón', 'detergente', 'limpiador', 'cloro', 'lavavajilla'],
+        'electrónicos': ['tv', 'televisor', 'celular', 'tablet', 'laptop', 'computadora']
+    }
+    
+    for categoria, palabras in categorias.items():
+        if any(palabra in product_name_lower for palabra in palabras):
+            return categoria
+    
+    return 'otros'
+
+def extract_provider_info_advanced(text, filename, tables_data=None, forms_data=None):
+    """Extrae información del proveedor usando Textract + Comprehend - MEJORADA"""
+    provider_info = {
+        'nombre': 'Desconocido',
+        'fecha': 'No detectada',
+        'total': 'No detectado',
+        'productos': [],
+        'filename': filename,
+        'ruc': 'No detectado',
+        'direccion': 'No detectada',
+        'tipo_documento': 'desconocido'
+    }
+    
+    # Usar Comprehend para análisis de entidades
+    try:
+        entities = llamar_aws('comprehend', obtener_cliente('comprehend').detect_entities, Text=text[:5000], LanguageCode='es')
+        for entity in entities['Entities']:
+            if entity['Type'] == 'ORGANIZATION' and provider_info['nombre'] == 'Desconocido':
+                provider_info['nombre'] = entity['Text']
+            elif entity['Type'] == 'DATE' and provider_info['fecha'] == 'No detectada':
+                provider_info['fecha'] = entity['Text']
+            elif entity['Type'] == 'COMMERCIAL_ITEM' and 'factura' in entity['Text'].lower():
+                provider_info['tipo_documento'] = 'factura'
+    except:
+        pass
+    
+    # Patrones mejorados para información del proveedor
+    provider_patterns = [
+        r'PROVEEDOR[:\s]+([^\n]+)',
+        r'EMISOR[:\s]+([^\n]+)',
+        r'RAZ[ÓO]N SOCIAL[:\s]+([^\n]+)',
+        r'EMPRESA[:\s]+([^\n]+)',
+        r'VENDEDOR[:\s]+([^\n]+)'
+    ]
+    
+    for pattern in provider_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            provider_name = match.group(1) if match.lastindex >= 1 else None
+            if provider_name is not None and len(provider_name.strip()) > 3:
+                provider_info['nombre'] = provider_name.strip()
+                break
+    
+    # Buscar RUC
+    ruc_patterns = [
+        r'RUC[:\s]*([0-9]{11})',
+        r'R\.U\.C\.?[:\s]*([0-9]{11})',
+    ]
+    
+    for pattern in ruc_patterns:
+        match = re.search(pattern, text)
+        if match and match.group(1) is not None:
+            provider_info['ruc'] = match.group(1)
+            break
+    
+    # Buscar fecha
+    date_patterns = [
+        r'FECHA[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'FECHA DE EMISI[ÓO]N[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    ]
+    
+    for pattern in date_patterns:
+        match = re.search(pattern, text)
+        if match and match.group(1) is not None:
+            provider_info['fecha'] = match.group(1)
+            break
+    
+    # Buscar total mejorado
+    total_patterns = [
+        r'TOTAL[:\s]*[\$S/\.\s]*([\d,]+(?:\.\d{2})?)',
+        r'IMPORTE TOTAL[:\s]*[\$S/\.\s]*([\d,]+(?:\.\d{2})?)',
+        r'MONTO TOTAL[:\s]*[\$S/\.\s]*([\d,]+(?:\.\d{2})?)',
+    ]
+    
+    for pattern in total_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match and match.group(1) is not None:
+            try:
+                provider_info['total'] = float(match.group(1).replace(',', ''))
+            except:
+                provider_info['total'] = match.group(1)
+            break
+    
+    # Extraer productos de múltiples fuentes
+    all_products = []
+    
+    # 1. De tablas (más confiable)
+    if tables_data:
+        table_products = extract_products_from_tables(tables_data, provider_info['nombre'])
+        all_products.extend(table_products)
+    
+    # 2. Del texto (como respaldo)
+    text_products = extract_products_from_text(text, provider_info['nombre'])
+    all_products.extend(text_products)
+    
+    # Eliminar duplicados
+    unique_products = []
+    seen_products = set()
+    for product in all_products:
+        product_key = f"{product['nombre']}_{product['precio']}"
+        if product_key not in seen_products:
+            seen_products.add(product_key)
+            unique_products.append(product)
+    
+    provider_info['productos'] = unique_products
+    
+    return provider_info
+
+def analyze_providers_comparison_advanced(results):
+    """Analiza y compara múltiples proveedores usando Textract + Bedrock"""
+    providers = []
+    
+    for result in results:
+        text = result.get('text', '')
+        if text and text.strip():
+            tables_data = extract_tables_from_result(result)
+            provider_info = extract_provider_info_advanced(
+                text, 
+                result['filename'], 
+                tables_data,
+                result.get('forms', {})
+            )
+            
+            providers.append(provider_info)
+    
+    return comparar_proveedores(providers)
+
+def comparar_proveedores(providers):
+    """Comparación de proveedores a partir de su información ya extraída (por documento)"""
+    # Solo considerar proveedores con información válida
+    providers = [
+        provider_info for provider_info in providers
+        if (provider_info['nombre'] != 'Desconocido' or 
+            provider_info['productos'] or
+            provider_info['total'] != 'No detectado')
+    ]
+    # Recolectar todos los productos para análisis
+    all_products = [producto for provider_info in providers for producto in provider_info['productos']]
+    
+    # Análisis por categorías
+    categorias_analisis = analyze_categories(all_products)
+    
+    # Generar recomendaciones
+    recomendaciones = generate_ai_recommendations(providers, all_products)
+    
+    # Análisis de precios comparativos
+    price_analysis = analyze_prices_comparison(all_products)
+    
+    return {
+        'total_providers': len(providers),
+        'providers': providers,
+        'productos_totales': all_products,
+        'analisis_categorias': categorias_analisis,
+        'recomendaciones': recomendaciones,
+        'analisis_precios': price_analysis
+    }
+
+def analyze_categories(products):
+    """Analiza productos por categorías"""
+    categorias = {}
+    
+    for producto in products:
+        categoria = producto['categoria']
+        if categoria not in categorias:
+            categorias[categoria] = {
+                'productos': [],
+                'proveedores': set(),
+                'precio_promedio': 0,
+                'precio_min': float('inf'),
+                'precio_max': 0,
+                'total_productos': 0
+            }
+        
+        categorias[categoria]['productos'].append(producto)
+        categorias[categoria]['proveedores'].add(producto['proveedor'])
+        categorias[categoria]['total_productos'] += 1
+        
+        # Estadísticas de precios - SOLO si el precio no es None
+        precio = producto.get('precio')
+        if precio is not None and isinstance(precio, (int, float)):
+            categorias[categoria]['precio_promedio'] += precio
+            categorias[categoria]['precio_min'] = min(categorias[categoria]['precio_min'], precio)
+            categorias[categoria]['precio_max'] = max(categorias[categoria]['precio_max'], precio)
+    
+    # Calcular promedios
+    for categoria in categorias:
+        productos_con_precio = [p for p in categorias[categoria]['productos'] if p.get('precio') is not None]
+        if productos_con_precio:
+            categorias[categoria]['precio_promedio'] /= len(productos_con_precio)
+        else:
+            categorias[categoria]['precio_promedio'] = 0
+            categorias[categoria]['precio_min'] = 0
+            categorias[categoria]['precio_max'] = 0
+    
+    return categorias
+
+def analyze_prices_comparison(products):
+    """Analiza comparación de precios entre proveedores"""
+    price_analysis = {}
+    
+    for producto in products:
+        if producto['precio']:
+            nombre_producto = producto['nombre']
+            if nombre_producto not in price_analysis:
+                price_analysis[nombre_producto] = {
+                    'proveedores': [],
+                    'precios': [],
+                    'precio_min': float('inf'),
+                    'precio_max': 0,
+                    'proveedor_mas_barato': None
+                }
+            
+            price_analysis[nombre_producto]['proveedores'].append(producto['proveedor'])
+            price_analysis[nombre_producto]['precios'].append(producto['precio'])
+            
+            # Actualizar min/max
+            if producto['precio'] < price_analysis[nombre_producto]['precio_min']:
+                price_analysis[nombre_producto]['precio_min'] = producto['precio']
+                price_analysis[nombre_producto]['proveedor_mas_barato'] = producto['proveedor']
+            
+            if producto['precio'] > price_analysis[nombre_producto]['precio_max']:
+                price_analysis[nombre_producto]['precio_max'] = producto['precio']
+    
+    return price_analysis
+
+def generate_ai_recommendations(providers, products):
+    """Genera recomendaciones inteligentes"""
+    if not providers or len(providers) < 2:
+        return {
+            'mejores_proveedores': {},
+            'ahorros_potenciales': [],
+            'alertas': ['Se necesitan al menos 2 proveedores para comparación']
+        }
+    
+    recomendaciones = {
+        'mejores_proveedores': {},
+        'ahorros_potenciales': [],
+        'alertas': []
+    }
+    
+    # Análisis por categoría
+    categorias = {}
+    for producto in products:
+        if producto['categoria'] not in categorias:
+            categorias[producto['categoria']] = []
+        categorias[producto['categoria']].append(producto)
+    
+    # Encontrar mejores precios por categoría
+    for categoria, productos_cat in categorias.items():
+        productos_con_precio = [p for p in productos_cat if p['precio']]
+        if productos_con_precio and len(set(p['proveedor'] for p in productos_con_precio)) >= 2:
+            mejor_precio = min(productos_con_precio, key=lambda x: x['precio'])
+            
+            recomendaciones['mejores_proveedores'][categoria] = {
+                'proveedor': mejor_precio['proveedor'],
+                'producto': mejor_precio['nombre'],
+                'precio': mejor_precio['precio'],
+                'categoria': categoria
+            }
+            
+            # Calcular ahorro potencial CON VALIDACIONES
+            precios = [p['precio'] for p in productos_con_precio if p['precio'] is not None]
+            if len(precios) > 1:
+                precio_promedio = sum(precios) / len(precios)
+                precio_mejor = mejor_precio['precio']
+            
+                # VALIDACIÓN 1: Precios deben ser razonables (entre S/. 0.10 y S/. 10,000)
+                if (0.10 <= precio_promedio <= 10000.0 and 
+                    0.10 <= precio_mejor <= 10000.0):
+                
+                    # VALIDACIÓN 2: Diferencia máxima del 80% (evita outliers)
+                    diferencia_maxima = precio_promedio * 0.8
+                    ahorro_calculado = precio_promedio - precio_mejor
+                
+                    # VALIDACIÓN 3: Ahorro mínimo significativo (S/. 0.50)
+                    if ahorro_calculado >= 0.50:
+                        ahorro_potencial = min(ahorro_calculado, diferencia_maxima)
+                    
+                        # VALIDACIÓN 4: No permitir ahorros absurdamente grandes
+                        if ahorro_potencial <= 50000:  # Máximo S/. 50,000 por producto
+                            recomendaciones['ahorros_potenciales'].append({
+                                'categoria': categoria,
+                                'proveedor_recomendado': mejor_precio['proveedor'],
+                                'ahorro_estimado': round(ahorro_potencial, 2),
+                                'producto_ejemplo': mejor_precio['nombre'],
+                                'precio_referencia': round(precio_promedio, 2),
+                                'precio_mejor': round(precio_mejor, 2)
+                            })
+    return recomendaciones
+
+# ============================================
+# FUNCIONES AUXILIARES EXISTENTES
+# ============================================
+
+def analyze_with_comprehend(text, clasificar=True):
+    """Analiza texto con AWS Comprehend para obtener metadatos.
+    
+    Con `clasificar=False` no clasifica el documento: lo hace después
+    clasificar_resultados para todo el lote.
+    """
+    if not text:
+        return {}
+    
+    try:
+        analisis = {'clasificacion_documento': clasificar_texto(text)} if clasificar else {}
+        sentiment_response = llamar_aws('comprehend', obtener_cliente('comprehend').detect_sentiment, Text=text[:5000], LanguageCode='es')
+        entities_response = llamar_aws('comprehend', obtener_cliente('comprehend').detect_entities, Text=text[:5000], LanguageCode='es')
+        
+        return {
+            **analisis,
+            'sentiment': sentiment_response.get('Sentiment', 'NEUTRAL'),
+            'sentiment_scores': sentiment_response.get('SentimentScore', {}),
+            'entities': entities_response.get('Entities', [])[:10],
+        }
+    except Exception as e:
+        return {
+            'clasificacion_documento': clasificar_texto(text)
+        } if clasificar else {}
+
+def calculate_file_metrics(result):
+    """Calcula métricas dinámicas para un archivo procesado"""
+    text = result.get('text', '')
+    tables_data = extract_tables_from_result(result)
+    forms = result.get('forms', {})
+    
+    word_count = len(text.split())
+    table_count = len(tables_data) if tables_data else 0
+    form_fields_count = len([k for k, v in forms.items() if k and k.strip() and v and v.strip()])
+    
+    return {
+        'word_count': word_count,
+        'table_count': table_count,
+        'form_fields_count': form_fields_count,
+    }
+
+# ============================================
+# ANÁLISIS POR DOCUMENTO (PIPELINE)
+# ============================================
+
+def enriquecer_resultado(result, clasificar=True):
+    """Análisis de Comprehend y métricas por documento (corre en el pipeline, fuera del hilo de UI)"""
+    text_content = result.get('text', '')
+    if text_content:
+        result['comprehend_analysis'] = analyze_with_comprehend(text_content, clasificar=clasificar)
+    result['metricas'] = calculate_file_metrics(result)
+    return result
+
+def clasificar_resultados(results, tamano_grupo=None):
+    """Clasifica en lote los resultados enriquecidos con `clasificar=False`.
+    
+    Corre después del pipeline, por grupos de `tamano_grupo` documentos: cada
+    grupo pasa por clasificar_lote (reglas para todos y un batch_detect_entities
+    por cada 25 sin resolver) en lugar de una cascada por documento.
+    """
+    tamano_grupo = tamano_grupo or CLASIFICACION_TAMANO_GRUPO
+    con_texto = [result for result in results if result and result.get('text')]
+    for inicio in range(0, len(con_texto), tamano_grupo):
+        grupo = con_texto[inicio:inicio + tamano_grupo]
+        clasificaciones = clasificar_multiple_textos([result['text'] for result in grupo])
+        for result, clasificacion in zip(grupo, clasificaciones):
+            result.setdefault('comprehend_analysis', {})['clasificacion_documento'] = clasificacion
+
+def analizar_documento_por_modo(result, modo):
+    """Análisis específico del modo para un solo documento (None si no aplica)"""
+    if modo == 'publicidad':
+        ordenes = procesar_ordenes_publicitarias([result])
+        return ordenes[0] if ordenes else None
+    
+    if modo == 'facturas':
+        texto = result.get('text', '')
+        tables_data = extract_tables_from_result(result)
+        provider_info = extract_provider_info_advanced(texto, result['filename'], tables_data, result.get('forms', {}))
+        validaciones = validar_factura_automatica(provider_info, texto)
+        return {
+            'proveedor': provider_info,
+            'validaciones': validaciones,
+            'estado': 'VÁLIDA' if all(validaciones.values()) else 'REVISAR'
+        }
+    
+    if modo == 'contratos':
+        contratos = analizar_contratos([result])
+        return contratos[0] if contratos else None
+    
+    return None
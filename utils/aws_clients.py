@@ -0,0 +1,72 @@
+# utils/aws_clients.py
+import os
+import threading
+
+# Pool de conexiones HTTP por cliente: debe cubrir los hilos que lo comparten
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "32"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "60"))
+# Los agentes de Bedrock tardan en empezar a emitir la respuesta
+AWS_BEDROCK_READ_TIMEOUT = float(os.getenv("AWS_BEDROCK_READ_TIMEOUT", "300"))
+
+# Servicios cuyos reintentos gestiona utils.aws_resiliencia: botocore no reintenta
+# por su cuenta para no multiplicar las llamadas bajo throttling
+_SERVICIOS_CON_RESILIENCIA = {'textract', 'comprehend', 'bedrock-agent-runtime'}
+
+_session = None
+_clientes = {}
+_lock = threading.Lock()
+
+
+def obtener_session():
+    """Session compartida: las credenciales se resuelven una sola vez por proceso"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _crear_session()
+        return _session
+
+
+def _crear_session():
+    # boto3 se importa en el primer uso; las variables se leen después de load_dotenv
+    import boto3
+
+    return boto3.Session(
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=os.getenv("AWS_REGION", "us-east-1")
+    )
+
+
+def _config_cliente(servicio):
+    from botocore.config import Config
+
+    if servicio in _SERVICIOS_CON_RESILIENCIA:
+        reintentos = {'mode': 'standard', 'total_max_attempts': 1}
+    else:
+        reintentos = {'mode': 'standard', 'max_attempts': 3}
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_BEDROCK_READ_TIMEOUT if servicio.startswith('bedrock') else AWS_READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries=reintentos
+    )
+
+
+def obtener_cliente(servicio, region_name=None):
+    """Cliente boto3 compartido por servicio y región, creado en el primer uso.
+
+    Los clientes de botocore son thread-safe, así que un mismo cliente (y su pool
+    de conexiones con keep-alive) sirve a todos los hilos y sesiones de Streamlit.
+    """
+    clave = (servicio, region_name)
+    cliente = _clientes.get(clave)
+    if cliente is not None:
+        return cliente
+    session = obtener_session()
+    with _lock:
+        if clave not in _clientes:
+            # Session.client no es thread-safe: se construye bajo el lock
+            _clientes[clave] = session.client(servicio, region_name=region_name, config=_config_cliente(servicio))
+        return _clientes[clave]
@@ -0,0 +1,213 @@
+# utils/aws_resiliencia.py
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+# Códigos de throttling: el servicio responde, pero pide bajar la tasa
+ERRORES_THROTTLING = {
+    'ThrottlingException',
+    'Throttling',
+    'ProvisionedThroughputExceededException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'LimitExceededException',
+    'SlowDown',
+}
+
+# Códigos de degradación del servicio: cuentan como fallo para el circuito
+ERRORES_SERVICIO = {
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'InternalServerError',
+    'InternalServerException',
+    'InternalFailure',
+}
+
+ERRORES_REINTENTABLES = ERRORES_THROTTLING | ERRORES_SERVICIO
+
+# Transacciones por segundo por servicio (compartidas por todo el proceso)
+TPS_DEFAULT = {
+    'textract': 10.0,
+    'comprehend': 20.0,
+    'bedrock-agent-runtime': 5.0,
+    's3': 100.0,
+    'comprehend-endpoint': 20.0,
+}
+
+# Intentos por servicio; el endpoint de clasificación no reintenta: al saturarse
+# se cae a la heurística de entidades en vez de esperar
+INTENTOS_DEFAULT = {
+    'comprehend-endpoint': 1,
+}
+
+
+class CircuitoAbiertoError(Exception):
+    """El servicio está degradado y el circuito rechaza llamadas sin intentar"""
+
+
+class TokenBucket:
+    """Limitador de tasa: `tasa` fichas por segundo con ráfagas de hasta `capacidad`"""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = tasa
+        self.capacidad = capacidad or max(1.0, tasa)
+        self._fichas = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta disponer de una ficha"""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+
+class CircuitBreaker:
+    """Abre tras `umbral_fallos` fallos seguidos; tras `tiempo_apertura` deja pasar una prueba"""
+
+    def __init__(self, umbral_fallos=5, tiempo_apertura=30.0):
+        self.umbral_fallos = umbral_fallos
+        self.tiempo_apertura = tiempo_apertura
+        self.estado = 'cerrado'
+        self._fallos = 0
+        self._abierto_desde = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == 'abierto':
+                if time.monotonic() - self._abierto_desde < self.tiempo_apertura:
+                    return False
+                # Semiabierto: una sola llamada de prueba
+                self.estado = 'semiabierto'
+                return True
+            if self.estado == 'semiabierto':
+                return False
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self.estado = 'cerrado'
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self.estado == 'semiabierto' or self._fallos >= self.umbral_fallos:
+                self.estado = 'abierto'
+                self._abierto_desde = time.monotonic()
+
+
+class PoliticaServicio:
+    """Limitador, circuito y parámetros de reintento de un servicio AWS"""
+
+    def __init__(self, servicio, tps, max_intentos=5, espera_base=0.2, espera_max=10.0):
+        self.servicio = servicio
+        self.bucket = TokenBucket(tps)
+        self.circuito = CircuitBreaker()
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.estadisticas = {'llamadas': 0, 'reintentos': 0, 'throttling': 0, 'errores_servicio': 0, 'rechazadas': 0}
+        self._lock = threading.Lock()
+
+    def contar(self, clave):
+        # Los contadores se actualizan desde todos los hilos del proceso
+        with self._lock:
+            self.estadisticas[clave] += 1
+
+    def resumen(self):
+        with self._lock:
+            return {'circuito': self.circuito.estado, **self.estadisticas}
+
+
+_politicas = {}
+_politicas_lock = threading.Lock()
+
+
+def obtener_politica(servicio):
+    """Política compartida (hilos y sesiones de Streamlit) para un servicio"""
+    with _politicas_lock:
+        if servicio not in _politicas:
+            variable = f"AWS_TPS_{servicio.upper().replace('-', '_')}"
+            tps = float(os.getenv(variable, TPS_DEFAULT.get(servicio, 10.0)))
+            _politicas[servicio] = PoliticaServicio(servicio, tps, max_intentos=INTENTOS_DEFAULT.get(servicio, 5))
+        return _politicas[servicio]
+
+
+def es_throttling(error):
+    """True si AWS rechazó la llamada por exceso de tasa"""
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in ERRORES_THROTTLING
+
+
+def es_fallo_servicio(error):
+    """True para 5xx y errores de conexión: los únicos que abren el circuito"""
+    if isinstance(error, ClientError):
+        if es_throttling(error):
+            return False
+        codigo = error.response.get('Error', {}).get('Code')
+        estado_http = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return codigo in ERRORES_SERVICIO or estado_http >= 500
+    return isinstance(error, (BotoConnectionError, ReadTimeoutError))
+
+
+def es_reintentable(error):
+    return es_throttling(error) or es_fallo_servicio(error)
+
+
+def llamar_aws(servicio, funcion, *args, **kwargs):
+    """Invoca `funcion` respetando la tasa del servicio, con reintentos y circuit breaker.
+
+    Los reintentos usan backoff exponencial con jitter decorrelacionado:
+    espera = min(espera_max, uniforme(espera_base, espera_anterior * 3)).
+    Solo los 5xx y los errores de conexión cuentan como fallo para el circuito:
+    el throttling se reintenta pero prueba que el servicio responde, igual que
+    los errores no reintentables, que se propagan sin reintentar.
+    """
+    politica = obtener_politica(servicio)
+    espera = politica.espera_base
+
+    for intento in range(1, politica.max_intentos + 1):
+        if not politica.circuito.permitir():
+            politica.contar('rechazadas')
+            raise CircuitoAbiertoError(f"Servicio {servicio} degradado: circuito abierto")
+
+        politica.bucket.adquirir()
+        politica.contar('llamadas')
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            if es_fallo_servicio(e):
+                politica.circuito.fallo()
+                politica.contar('errores_servicio')
+            else:
+                # Throttling o error del llamador (validación, permisos...): el servicio responde
+                politica.circuito.exito()
+                if not es_throttling(e):
+                    raise
+                politica.contar('throttling')
+            if intento == politica.max_intentos:
+                raise
+            politica.contar('reintentos')
+            espera = min(politica.espera_max, random.uniform(politica.espera_base, espera * 3))
+            time.sleep(espera)
+            continue
+
+        politica.circuito.exito()
+        return resultado
+
+
+def resumen_resiliencia():
+    """Estado de circuito y contadores por servicio"""
+    with _politicas_lock:
+        return {servicio: politica.resumen() for servicio, politica in _politicas.items()}
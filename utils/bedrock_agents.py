@@ -1,18 +1,14 @@
 # utils/bedrock_agents.py
-import boto3
 import uuid
 import json
 from botocore.exceptions import ClientError
 import os
+from utils.aws_clients import obtener_cliente
+from utils.aws_resiliencia import llamar_aws, CircuitoAbiertoError
 
 def get_bedrock_agent_client(region_name="us-east-1"):
-    """Obtiene el cliente de Bedrock Agent Runtime"""
-    session = boto3.Session(
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        region_name=region_name
-    )
-    return session.client('bedrock-agent-runtime')
+    """Obtiene el cliente compartido de Bedrock Agent Runtime"""
+    return obtener_cliente('bedrock-agent-runtime', region_name)
 
 def invoke_agent_legacy(agent_id, agent_alias_id, session_id, input_text):
     """Versión que SÍ funciona - forzando respuesta en español"""
@@ -24,7 +20,8 @@ def invoke_agent_legacy(agent_id, agent_alias_id, session_id, input_text):
         enhanced_input = spanish_instruction + input_text
         
         # Invocar el agente
-        response = bedrock_agent.invoke_agent(
+        response = llamar_aws(
+            'bedrock-agent-runtime', bedrock_agent.invoke_agent,
             agentId=agent_id,
             agentAliasId=agent_alias_id,
             sessionId=session_id,
@@ -44,5 +41,7 @@ def invoke_agent_legacy(agent_id, agent_alias_id, session_id, input_text):
         error_code = e.response['Error']['Code']
         error_message = e.response['Error']['Message']
         return f"Error AWS ({error_code}): {error_message}"
+    except CircuitoAbiertoError as e:
+        return f"Servicio temporalmente no disponible: {str(e)}"
     except Exception as e:
         return f"Error inesperado: {str(e)}"
\ No newline at end of file
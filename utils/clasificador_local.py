@@ -0,0 +1,321 @@
+# utils/clasificador_local.py
+"""Clasificador local de documentos entrenado con los que ya se clasificaron.
+
+TF-IDF sobre n-gramas de palabras (1-2) y de caracteres (3-5, dentro de cada
+palabra) proyectados con hashing a un espacio fijo, y regresión logística
+multinomial entrenada con SGD en NumPy. Corre entre los patrones regex y
+Comprehend: si la probabilidad de la clase supera el umbral, el documento se
+resuelve sin llamada de red.
+
+Entrenamiento (JSONL con {"texto", "clase"} o la salida de procesar_lote.py):
+    python -m utils.clasificador_local entrenar resultados.jsonl --salida modelos/clasificador_local.npz
+    python -m utils.clasificador_local evaluar validacion.jsonl --modelo modelos/clasificador_local.npz
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+CLASIFICADOR_LOCAL_MODELO = os.getenv("CLASIFICADOR_LOCAL_MODELO", "modelos/clasificador_local.npz")
+CLASIFICADOR_LOCAL_UMBRAL = float(os.getenv("CLASIFICADOR_LOCAL_UMBRAL", "0.8"))
+
+N_CARACTERISTICAS = 2 ** 18
+MAX_CARACTERES = 20000  # Solo el inicio del documento: costo acotado por documento
+VERSION_MODELO = 1
+
+# Etiquetas que no sirven para entrenar: sin clase o asignadas por este mismo modelo
+_CLASES_EXCLUIDAS = {'desconocido', 'error_comprehend'}
+_METODOS_EXCLUIDOS = {'modelo_local', 'texto_insuficiente'}
+
+_PALABRA = re.compile(r'\w+')
+
+
+def _indice(termino):
+    # crc32 es estable entre procesos (hash() de Python no lo es)
+    return zlib.crc32(termino.encode('utf-8')) % N_CARACTERISTICAS
+
+
+@lru_cache(maxsize=100000)
+def _indices_palabra(palabra):
+    """Índices de la palabra y de sus n-gramas de caracteres (3 a 5, con bordes)"""
+    indices = [_indice('w:' + palabra)]
+    marcada = f' {palabra} '
+    for n in (3, 4, 5):
+        indices.extend(_indice(f'c{n}:' + marcada[i:i + n]) for i in range(len(marcada) - n + 1))
+    return tuple(indices)
+
+
+def contar_terminos(texto):
+    """{índice de característica: frecuencia} de un texto"""
+    palabras = _PALABRA.findall(texto[:MAX_CARACTERES].lower())
+    conteo = Counter()
+    for palabra, veces in Counter(palabras).items():
+        for indice in _indices_palabra(palabra):
+            conteo[indice] += veces
+    for bigrama in zip(palabras, palabras[1:]):
+        conteo[_indice('b:' + ' '.join(bigrama))] += 1
+    return conteo
+
+
+def _matriz_dispersa(conteos):
+    """Lista de conteos -> CSR (indptr, indices, datos) con TF sublineal"""
+    import numpy as np
+
+    indptr = np.zeros(len(conteos) + 1, dtype=np.int64)
+    indices = []
+    datos = []
+    for fila, conteo in enumerate(conteos):
+        indices.extend(conteo.keys())
+        datos.extend(1.0 + math.log(veces) for veces in conteo.values())
+        indptr[fila + 1] = len(indices)
+    return indptr, np.array(indices, dtype=np.int64), np.array(datos, dtype=np.float32)
+
+
+def _normalizar_filas(indptr, datos):
+    import numpy as np
+
+    filas = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    normas = np.sqrt(np.bincount(filas, weights=datos.astype(np.float64) ** 2, minlength=len(indptr) - 1))
+    normas[normas == 0] = 1.0
+    return (datos / normas[filas]).astype(np.float32), filas
+
+
+def _softmax(puntajes):
+    import numpy as np
+
+    puntajes = puntajes - puntajes.max(axis=1, keepdims=True)
+    exp = np.exp(puntajes)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class ModeloLocal:
+    """Pesos de la regresión logística e IDF; predice probabilidades por clase"""
+
+    def __init__(self, clases, pesos, sesgo, idf):
+        self.clases = list(clases)
+        self.pesos = pesos    # (N_CARACTERISTICAS, n_clases) float32
+        self.sesgo = sesgo    # (n_clases,) float32
+        self.idf = idf        # (N_CARACTERISTICAS,) float32
+
+    def _tfidf(self, conteos):
+        indptr, indices, datos = _matriz_dispersa(conteos)
+        datos, filas = _normalizar_filas(indptr, datos * self.idf[indices])
+        return indices, datos, filas
+
+    def _puntajes(self, indices, datos, filas, n_filas):
+        import numpy as np
+
+        puntajes = np.tile(self.sesgo, (n_filas, 1))
+        np.add.at(puntajes, filas, datos[:, None] * self.pesos[indices])
+        return puntajes
+
+    def probabilidades(self, textos):
+        """Matriz (n_textos, n_clases) de probabilidades"""
+        indices, datos, filas = self._tfidf([contar_terminos(texto) for texto in textos])
+        return _softmax(self._puntajes(indices, datos, filas, len(textos)))
+
+    def predecir(self, texto):
+        """(clase, probabilidad) más probable para un texto"""
+        probabilidades = self.probabilidades([texto])[0]
+        mejor = int(probabilidades.argmax())
+        return self.clases[mejor], float(probabilidades[mejor])
+
+    def guardar(self, ruta):
+        """Guarda solo las filas con pesos no nulos; .npz sin pickle"""
+        import numpy as np
+
+        filas = np.flatnonzero(np.abs(self.pesos).sum(axis=1))
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(ruta, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(VERSION_MODELO),
+                clases=np.array(self.clases),
+                filas=filas.astype(np.int32),
+                pesos=self.pesos[filas],
+                sesgo=self.sesgo,
+                idf_filas=self.idf[filas],
+                idf_ausente=np.array(self.idf.max() if len(self.idf) else 1.0, dtype=np.float32)
+            )
+
+    @classmethod
+    def cargar(cls, ruta):
+        import numpy as np
+
+        with np.load(ruta, allow_pickle=False) as datos:
+            if int(datos['version']) != VERSION_MODELO:
+                raise ValueError(f"Versión de modelo no soportada: {int(datos['version'])}")
+            clases = [str(clase) for clase in datos['clases']]
+            pesos = np.zeros((N_CARACTERISTICAS, len(clases)), dtype=np.float32)
+            pesos[datos['filas']] = datos['pesos']
+            # Términos que no estaban en el entrenamiento: IDF máximo, como si fueran raros
+            idf = np.full(N_CARACTERISTICAS, datos['idf_ausente'], dtype=np.float32)
+            idf[datos['filas']] = datos['idf_filas']
+            return cls(clases, pesos, datos['sesgo'].astype(np.float32), idf)
+
+
+def entrenar(textos, clases, epocas=15, tasa=20.0, regularizacion=1e-5, tamano_lote=32, semilla=0):
+    """Entrena un ModeloLocal con SGD por mini-lotes sobre TF-IDF con hashing"""
+    import numpy as np
+
+    nombres_clases = sorted(set(clases))
+    objetivo = np.array([nombres_clases.index(clase) for clase in clases])
+    conteos = [contar_terminos(texto) for texto in textos]
+
+    # IDF suavizado: log((1 + N) / (1 + df)) + 1
+    frecuencia_doc = np.zeros(N_CARACTERISTICAS, dtype=np.float64)
+    for conteo in conteos:
+        frecuencia_doc[list(conteo.keys())] += 1
+    idf = (np.log((1 + len(textos)) / (1 + frecuencia_doc)) + 1).astype(np.float32)
+
+    modelo = ModeloLocal(
+        nombres_clases,
+        np.zeros((N_CARACTERISTICAS, len(nombres_clases)), dtype=np.float32),
+        np.zeros(len(nombres_clases), dtype=np.float32),
+        idf
+    )
+    # Las filas sin términos de entrenamiento quedan en cero y no se guardan
+    matrices = [modelo._tfidf([conteo]) for conteo in conteos]
+
+    generador = random.Random(semilla)
+    orden = list(range(len(textos)))
+    for epoca in range(epocas):
+        generador.shuffle(orden)
+        tasa_epoca = tasa / math.sqrt(1 + epoca)
+        for inicio in range(0, len(orden), tamano_lote):
+            lote = orden[inicio:inicio + tamano_lote]
+            indices = np.concatenate([matrices[i][0] for i in lote])
+            datos = np.concatenate([matrices[i][1] for i in lote])
+            filas = np.repeat(np.arange(len(lote)), [len(matrices[i][0]) for i in lote])
+
+            probabilidades = _softmax(modelo._puntajes(indices, datos, filas, len(lote)))
+            probabilidades[np.arange(len(lote)), objetivo[lote]] -= 1.0
+            gradiente = probabilidades / len(lote)
+
+            np.add.at(modelo.pesos, indices, -tasa_epoca * datos[:, None] * gradiente[filas])
+            modelo.sesgo -= tasa_epoca * gradiente.sum(axis=0)
+        modelo.pesos *= 1 - tasa_epoca * regularizacion
+    return modelo
+
+
+def leer_ejemplos(rutas):
+    """(textos, clases) desde JSONL: {"texto", "clase"} o filas de procesar_lote.py"""
+    textos, clases = [], []
+    for ruta in rutas:
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                fila = json.loads(linea)
+                texto = fila.get('texto') or fila.get('text') or ''
+                clasificacion = fila.get('clasificacion') or {}
+                clase = fila.get('clase') or clasificacion.get('clase')
+                if (not clase or clase in _CLASES_EXCLUIDAS
+                        or clasificacion.get('metodo') in _METODOS_EXCLUIDOS or len(texto.strip()) < 10):
+                    continue
+                textos.append(texto)
+                clases.append(clase)
+    return textos, clases
+
+
+def evaluar(modelo, textos, clases, umbral=None):
+    """Exactitud global y cobertura (documentos sobre el umbral) con su exactitud"""
+    umbral = CLASIFICADOR_LOCAL_UMBRAL if umbral is None else umbral
+    probabilidades = modelo.probabilidades(textos)
+    predichas = [modelo.clases[i] for i in probabilidades.argmax(axis=1)]
+    confianzas = probabilidades.max(axis=1)
+    aciertos = [predicha == clase for predicha, clase in zip(predichas, clases)]
+    cubiertos = [acierto for acierto, confianza in zip(aciertos, confianzas) if confianza >= umbral]
+    return {
+        'documentos': len(textos),
+        'exactitud': sum(aciertos) / len(textos) if textos else 0.0,
+        'umbral': umbral,
+        'cobertura': len(cubiertos) / len(textos) if textos else 0.0,
+        'exactitud_cubiertos': sum(cubiertos) / len(cubiertos) if cubiertos else 0.0
+    }
+
+
+_modelo = None
+_modelo_cargado = False
+_modelo_lock = threading.Lock()
+
+
+def obtener_modelo(ruta=None):
+    """Modelo compartido, cargado una vez; None si no hay modelo entrenado"""
+    global _modelo, _modelo_cargado
+    with _modelo_lock:
+        if not _modelo_cargado:
+            ruta = ruta or CLASIFICADOR_LOCAL_MODELO
+            try:
+                _modelo = ModeloLocal.cargar(ruta) if ruta and os.path.exists(ruta) else None
+            except Exception as e:
+                print(f"No se pudo cargar el clasificador local ({ruta}): {e}")
+                _modelo = None
+            _modelo_cargado = True
+        return _modelo
+
+
+def _imprimir_evaluacion(metricas):
+    print(f"Documentos: {metricas['documentos']} · exactitud: {metricas['exactitud']:.1%}")
+    print(f"Umbral {metricas['umbral']:.2f}: resuelve {metricas['cobertura']:.1%} sin Comprehend "
+          f"con exactitud {metricas['exactitud_cubiertos']:.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenamiento y evaluación del clasificador local")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_entrenar = subcomandos.add_parser('entrenar', help="Entrena y guarda un modelo .npz")
+    p_entrenar.add_argument('datos', nargs='+', help="Archivos JSONL de documentos ya clasificados")
+    p_entrenar.add_argument('--salida', default=CLASIFICADOR_LOCAL_MODELO)
+    p_entrenar.add_argument('--epocas', type=int, default=15)
+    p_entrenar.add_argument('--validacion', type=float, default=0.2,
+                            help="Fracción reservada para medir exactitud y cobertura (0 = ninguna)")
+    p_entrenar.add_argument('--umbral', type=float, default=CLASIFICADOR_LOCAL_UMBRAL)
+
+    p_evaluar = subcomandos.add_parser('evaluar', help="Mide un modelo guardado sobre otro JSONL")
+    p_evaluar.add_argument('datos', nargs='+')
+    p_evaluar.add_argument('--modelo', default=CLASIFICADOR_LOCAL_MODELO)
+    p_evaluar.add_argument('--umbral', type=float, default=CLASIFICADOR_LOCAL_UMBRAL)
+
+    args = parser.parse_args(argv)
+    textos, clases = leer_ejemplos(args.datos)
+    if not textos:
+        print("No hay documentos clasificados utilizables en los datos")
+        return 1
+
+    if args.comando == 'evaluar':
+        inicio = time.perf_counter()
+        modelo = ModeloLocal.cargar(args.modelo)
+        print(f"Modelo cargado en {(time.perf_counter() - inicio) * 1000:.0f} ms: {', '.join(modelo.clases)}")
+        _imprimir_evaluacion(evaluar(modelo, textos, clases, args.umbral))
+        return 0
+
+    print(f"Ejemplos: {len(textos)} · clases: {dict(Counter(clases))}")
+    if args.validacion > 0 and len(textos) >= 10:
+        orden = list(range(len(textos)))
+        random.Random(0).shuffle(orden)
+        corte = int(len(orden) * (1 - args.validacion))
+        entrenamiento, validacion = orden[:corte], orden[corte:]
+        modelo = entrenar([textos[i] for i in entrenamiento], [clases[i] for i in entrenamiento], epocas=args.epocas)
+        _imprimir_evaluacion(evaluar(modelo, [textos[i] for i in validacion], [clases[i] for i in validacion], args.umbral))
+
+    inicio = time.perf_counter()
+    modelo = entrenar(textos, clases, epocas=args.epocas)
+    modelo.guardar(args.salida)
+    print(f"Modelo entrenado en {time.perf_counter() - inicio:.1f}s y guardado en {args.salida} "
+          f"({os.path.getsize(args.salida) / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
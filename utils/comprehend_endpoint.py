@@ -0,0 +1,177 @@
+# utils/comprehend_endpoint.py
+import os
+import threading
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+from utils.aws_clients import obtener_cliente
+from utils.aws_resiliencia import CircuitoAbiertoError, es_reintentable, llamar_aws
+
+COMPREHEND_ENDPOINT_ARN = os.getenv("COMPREHEND_ENDPOINT_ARN")
+COMPREHEND_ENDPOINT_CONCURRENCIA = int(os.getenv("COMPREHEND_ENDPOINT_CONCURRENCIA", "4"))
+COMPREHEND_ENDPOINT_ESPERA = float(os.getenv("COMPREHEND_ENDPOINT_ESPERA", "2"))
+COMPREHEND_ENDPOINT_MAX_BYTES = int(os.getenv("COMPREHEND_ENDPOINT_MAX_BYTES", "10000"))
+COMPREHEND_ENDPOINT_IU = os.getenv("COMPREHEND_ENDPOINT_IU")
+
+CARACTERES_POR_IU = 100  # Cada unidad de inferencia procesa 100 caracteres por segundo
+VENTANA_UTILIZACION = 60.0
+
+
+def _recortar_bytes(texto, max_bytes):
+    """Recorta a `max_bytes` en UTF-8 sin partir un carácter"""
+    return texto.encode('utf-8')[:max_bytes].decode('utf-8', 'ignore')
+
+
+class EndpointClasificacion:
+    """Endpoint en tiempo real de un clasificador personalizado de Comprehend.
+
+    `clasificar` hace un classify_document con concurrencia acotada por un
+    semáforo y devuelve None cuando hay que usar la heurística de entidades:
+    endpoint saturado, con throttling, con el circuito abierto o inexistente.
+    Lleva la utilización de las unidades de inferencia (caracteres por segundo
+    enviados en la última ventana frente a la capacidad aprovisionada).
+    """
+
+    def __init__(self, arn, concurrencia=None, unidades=None):
+        self.arn = arn
+        self.concurrencia = concurrencia or COMPREHEND_ENDPOINT_CONCURRENCIA
+        self._semaforo = threading.BoundedSemaphore(self.concurrencia)
+        self._unidades = unidades
+        self._lock_unidades = threading.Lock()
+        self._lock = threading.Lock()
+        self._envios = deque()  # (instante, caracteres) dentro de la ventana
+        self._en_vuelo = 0
+        self.deshabilitado = None  # Motivo, si el endpoint no existe
+        self.estadisticas = {
+            'llamadas': 0, 'throttling': 0, 'saturado': 0, 'circuito_abierto': 0,
+            'errores': 0, 'max_en_vuelo': 0, 'segundos': 0.0
+        }
+
+    def _contar(self, clave):
+        with self._lock:
+            self.estadisticas[clave] += 1
+
+    def clasificar(self, texto):
+        """Clase y probabilidades del endpoint, o None para caer a la heurística"""
+        if self.deshabilitado:
+            return None
+        if not self._semaforo.acquire(timeout=COMPREHEND_ENDPOINT_ESPERA):
+            self._contar('saturado')
+            return None
+
+        texto = _recortar_bytes(texto, COMPREHEND_ENDPOINT_MAX_BYTES)
+        with self._lock:
+            self._en_vuelo += 1
+            self.estadisticas['max_en_vuelo'] = max(self.estadisticas['max_en_vuelo'], self._en_vuelo)
+        inicio = time.monotonic()
+        try:
+            respuesta = llamar_aws(
+                'comprehend-endpoint', obtener_cliente('comprehend').classify_document,
+                Text=texto,
+                EndpointArn=self.arn
+            )
+        except CircuitoAbiertoError:
+            self._contar('circuito_abierto')
+            return None
+        except ClientError as e:
+            codigo = e.response.get('Error', {}).get('Code')
+            if codigo == 'ResourceNotFoundException':
+                self.deshabilitado = f"{codigo}: {self.arn}"
+                print(f"Endpoint de Comprehend no disponible, se usa la heurística de entidades ({codigo})")
+            self._contar('throttling' if es_reintentable(e) or codigo == 'ResourceUnavailableException' else 'errores')
+            return None
+        except Exception:
+            self._contar('errores')
+            return None
+        finally:
+            ahora = time.monotonic()
+            with self._lock:
+                self._en_vuelo -= 1
+            self._semaforo.release()
+
+        with self._lock:
+            self.estadisticas['llamadas'] += 1
+            self.estadisticas['segundos'] += ahora - inicio
+            self._envios.append((ahora, len(texto)))
+            self._podar(ahora)
+        if self._unidades is None:
+            # Se consulta aquí, en el hilo que clasifica, y no al mostrar la utilización
+            self.unidades()
+
+        # Clasificador multiclase -> Classes; multietiqueta -> Labels
+        clases = respuesta.get('Classes') or respuesta.get('Labels') or []
+        if not clases:
+            return None
+        mejor = max(clases, key=lambda clase: clase['Score'])
+        return {
+            'clase': mejor['Name'],
+            'confianza': round(mejor['Score'], 2),
+            'metodo': 'comprehend_endpoint',
+            'probabilidades': {clase['Name']: round(clase['Score'], 4) for clase in clases}
+        }
+
+    def _podar(self, ahora):
+        """Descarta los envíos fuera de la ventana (con self._lock tomado)"""
+        while self._envios and ahora - self._envios[0][0] > VENTANA_UTILIZACION:
+            self._envios.popleft()
+
+    def unidades(self):
+        """Unidades de inferencia aprovisionadas (env o describe_endpoint), o None.
+
+        Se consultan una sola vez; el valor (0 si la consulta falló) queda cacheado.
+        """
+        with self._lock_unidades:
+            if self._unidades is not None:
+                return self._unidades or None
+            try:
+                if COMPREHEND_ENDPOINT_IU:
+                    self._unidades = int(COMPREHEND_ENDPOINT_IU)
+                else:
+                    respuesta = llamar_aws('comprehend', obtener_cliente('comprehend').describe_endpoint, EndpointArn=self.arn)
+                    propiedades = respuesta['EndpointProperties']
+                    self._unidades = propiedades.get('CurrentInferenceUnits') or propiedades.get('DesiredInferenceUnits') or 0
+            except Exception as e:
+                print(f"No se pudieron obtener las unidades de inferencia del endpoint: {e}")
+                self._unidades = 0
+        return self._unidades or None
+
+    def utilizacion(self):
+        """Estadísticas del endpoint y uso de su capacidad en la última ventana.
+
+        No llama a AWS: usa las unidades ya cacheadas (None hasta la primera clasificación).
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            self._podar(ahora)
+            caracteres = sum(n for _, n in self._envios)
+            estadisticas = dict(self.estadisticas)
+            en_vuelo = self._en_vuelo
+        unidades = self._unidades or None
+        caracteres_por_segundo = caracteres / VENTANA_UTILIZACION
+        return {
+            **estadisticas,
+            'en_vuelo': en_vuelo,
+            'concurrencia': self.concurrencia,
+            'unidades_inferencia': unidades,
+            'caracteres_por_segundo': round(caracteres_por_segundo, 1),
+            'utilizacion': round(caracteres_por_segundo / (unidades * CARACTERES_POR_IU), 3) if unidades else None,
+            'latencia_media': round(estadisticas['segundos'] / estadisticas['llamadas'], 3) if estadisticas['llamadas'] else None,
+            'deshabilitado': self.deshabilitado
+        }
+
+
+_endpoint = None
+_endpoint_lock = threading.Lock()
+
+
+def obtener_endpoint():
+    """Endpoint compartido del clasificador personalizado; None si no hay ARN configurado"""
+    global _endpoint
+    if not COMPREHEND_ENDPOINT_ARN:
+        return None
+    with _endpoint_lock:
+        if _endpoint is None:
+            _endpoint = EndpointClasificacion(COMPREHEND_ENDPOINT_ARN)
+        return _endpoint
@@ -1,21 +1,212 @@
-import boto3
 import re
 import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from botocore.exceptions import ClientError
+from utils.aws_clients import obtener_cliente
+from utils.aho_corasick import AutomataAhoCorasick
+from utils.aws_resiliencia import llamar_aws
+from utils.clasificador_local import CLASIFICADOR_LOCAL_UMBRAL, obtener_modelo
+from utils.comprehend_endpoint import obtener_endpoint
+from utils.escaneo_regex import EscaneoRegex
 
 class ClasificadorDocumentos:
+    # Palabras clave por categoría con pesos (reglas rápidas)
+    PALABRAS_CLAVE = {
+        'contrato': {
+            'keywords': [
+                'contrato de', 'contrato para', 'contrato n°', 'contrato número',
+                'contratación', 'convenio', 'acuerdo entre', 'cláusula',
+                'vigencia', 'partes contratantes', 'objeto del contrato'
+            ],
+            'peso': 1.0
+        },
+        'factura': {
+            'keywords': [
+                'factura electronica', 'factura n°', 'factura número',
+                'ruc:', 'igv:', 'importe total', 'valor venta',
+                'gravada', 'inafecta', 'exonerada', 'detracción'
+            ],
+            'peso': 1.0
+        },
+        'boleta': {
+            'keywords': [
+                'boleta de venta', 'boleta n°', 'boleta número',
+                'consumidor final', 'dni:', 'documento identidad',
+                'boletería', 'venta al contado'
+            ],
+            'peso': 0.9
+        },
+        'demanda': {
+            'keywords': [
+                'demanda de', 'juzgado', 'demandante', 'demandado',
+                'proceso judicial', 'recurso', 'sentencia',
+                'juez', 'tribunal', 'proceso número'
+            ],
+            'peso': 0.9
+        },
+        'estado_cuenta': {
+            'keywords': [
+                'estado de cuenta', 'extracto bancario', 'tarjeta crédito',
+                'movimientos', 'saldo disponible', 'banco',
+                'débitos', 'créditos', 'pago mínimo', 'fecha corte'
+            ],
+            'peso': 0.9
+        },
+        'recibo': {
+            'keywords': [
+                'recibo de', 'pago de', 'servicio de', 'mes de',
+                'luz', 'agua', 'teléfono', 'internet',
+                'servicios públicos', 'suministro'
+            ],
+            'peso': 0.8
+        },
+        'carta_notarial': {
+            'keywords': [
+                'carta notarial', 'notaría', 'notarial',
+                'fe pública', 'notificación', 'intimación',
+                'notario público', 'protocolo notarial'
+            ],
+            'peso': 0.8
+        }
+    }
+    
+    # Máximo de documentos por llamada a batch_detect_entities
+    LOTE_COMPREHEND = 25
+    
+    # Compilado una vez: todas las palabras clave en un solo recorrido del texto
+    _automata_palabras = AutomataAhoCorasick(
+        keyword for config in PALABRAS_CLAVE.values() for keyword in config['keywords']
+    )
+    
+    # Patrones regex por categoría con pesos. Los de texto libre entre dos
+    # literales son perezosos y acotados para no retroceder sobre todo el texto.
+    PATRONES = {
+        'factura': [
+            (r'RUC\s*:\s*\d{11}', 2.0),
+            (r'FACTURA\s*ELECTRÓNICA\s*:\s*[Ff]\d{3}-\d{1,9}', 2.5),
+            (r'IGV\s*\(\d+%\)\s*:\s*S/\.\s*\d+\.\d{2}', 1.5),
+            (r'N°\s*DE\s*DOCUMENTO\s*:\s*\d{11}', 1.5),
+            (r'OPERACIÓN\s*GRAVADA\s*:\s*S/\.\s*\d+\.\d{2}', 1.0)
+        ],
+        'contrato': [
+            (r'CONTRATO\s*DE[A-Z\s]{1,200}?N°\s*\d', 2.0),
+            (r'CLÁUSULA\s*(PRIMERA|SEGUNDA|TERCERA|CUARTA|QUINTA|SEXTA|SÉPTIMA|OCTAVA|NOVENA|DÉCIMA)', 1.5),
+            (r'VIGENCIA\s*:\s*DEL\s*\d{2}/\d{2}/\d{4}\s*AL\s*\d{2}/\d{2}/\d{4}', 1.0),
+            (r'ENTRE[A-Z\s]{1,200}?Y[A-Z\s]', 1.0),
+            (r'OBJETO\s*DEL\s*CONTRATO', 1.5)
+        ],
+        'boleta': [
+            (r'BOLETA\s*DE\s*VENTA\s*ELECTRÓNICA\s*:\s*[Bb]\d{3}-\d{1,9}', 2.0),
+            (r'DOCUMENTO\s*DE\s*IDENTIDAD\s*:\s*\d{8}', 1.5),
+            (r'CONSUMIDOR\s*FINAL', 1.0),
+            (r'BOLETA\s*N°\s*\d+', 1.0)
+        ],
+        'estado_cuenta': [
+            (r'TARJETA\s*DE\s*CRÉDITO\s*:\s*\*+\d{4}', 2.0),
+            (r'LÍMITE\s*DE\s*CRÉDITO\s*:\s*S/\.\s*\d+\.\d{2}', 1.5),
+            (r'FECHA\s*DE\s*CORTE\s*:\s*\d{2}/\d{2}/\d{4}', 1.0),
+            (r'PAGO\s*MÍNIMO\s*:\s*S/\.\s*\d+\.\d{2}', 1.0),
+            (r'SALDO\s*ANTERIOR\s*:\s*S/\.\s*\d+\.\d{2}', 1.0)
+        ],
+        'recibo': [
+            (r'RECIBO\s*DE\s*PAGO\s*N°\s*\d+', 1.5),
+            (r'SERVICIO\s*DE\s*(LUZ|AGUA|TELEFONÍA|INTERNET)', 1.0),
+            (r'PERÍODO\s*:\s*\w+\s*\d{4}', 1.0),
+            (r'LECTURA\s*ANTERIOR\s*:\s*\d+', 0.8)
+        ]
+    }
+    
+    # Compilados una vez; cada patrón se identifica como `<clase>_<índice>`
+    _escaneo_patrones = EscaneoRegex(
+        [(f'{clase}_{i}', patron) for clase, lista in PATRONES.items() for i, (patron, _) in enumerate(lista)],
+        re.IGNORECASE
+    )
+    
     def __init__(self):
         """Inicializa el clasificador híbrido Comprehend + Reglas"""
-        self.comprehend = boto3.client('comprehend')
+        # Documentos por método de la cascada y escalados por el modelo local
+        self._por_metodo = Counter()
+        self._escalados_local = 0
+        self._estadisticas_lock = threading.Lock()
+        
+    @property
+    def comprehend(self):
+        """Cliente Comprehend compartido, creado en el primer uso"""
+        return obtener_cliente('comprehend')
         
     def clasificar_documento(self, texto: str) -> Dict:
         """
         Clasifica un documento usando estrategia en cascada:
         1. Reglas rápidas (gratis)
         2. Patrones avanzados (gratis) 
-        3. Comprehend (solo si es necesario)
+        3. Modelo local entrenado (gratis, sin red)
+        4. Comprehend (solo si es necesario): endpoint del clasificador
+           personalizado o, si no hay, entidades + heurística
+        """
+        resultado = self._clasificar_sin_comprehend(texto)
+        if resultado is None:
+            # Solo usar Comprehend si las reglas fallan
+            resultado = self._clasificar_con_comprehend(texto)
+        
+        self._registrar([resultado])
+        return resultado
+    
+    def clasificar_lote(self, textos: List[str]) -> List[Dict]:
+        """
+        Clasifica múltiples documentos eficientemente: primero las reglas
+        gratuitas para todos, luego el endpoint propio (si hay) y un solo
+        batch_detect_entities por cada 25 documentos que queden sin resolver.
+        Resultados en orden de entrada.
         """
+        resultados = [self._clasificar_sin_comprehend(texto) for texto in textos]
+        pendientes = [i for i, resultado in enumerate(resultados) if resultado is None]
+        
+        # Con endpoint propio: una llamada por documento, en paralelo hasta su concurrencia;
+        # los que no obtengan respuesta siguen al lote de entidades
+        endpoint = obtener_endpoint()
+        if endpoint is not None and pendientes:
+            with ThreadPoolExecutor(max_workers=endpoint.concurrencia) as executor:
+                clasificados = list(executor.map(endpoint.clasificar, [textos[i] for i in pendientes]))
+            for i, resultado in zip(pendientes, clasificados):
+                resultados[i] = resultado
+            pendientes = [i for i in pendientes if resultados[i] is None]
+        
+        for inicio in range(0, len(pendientes), self.LOTE_COMPREHEND):
+            grupo = pendientes[inicio:inicio + self.LOTE_COMPREHEND]
+            clasificados = self._clasificar_lote_con_comprehend([textos[i] for i in grupo])
+            for i, resultado in zip(grupo, clasificados):
+                resultados[i] = resultado
+        
+        self._registrar(resultados)
+        return resultados
+    
+    def _registrar(self, resultados: List[Dict]):
+        with self._estadisticas_lock:
+            self._por_metodo.update(resultado.get('metodo', 'desconocido') for resultado in resultados)
+    
+    def estadisticas(self) -> Dict:
+        """Documentos clasificados por método y cuántos se resolvieron sin llamar a Comprehend"""
+        with self._estadisticas_lock:
+            por_metodo = dict(self._por_metodo)
+            escalados_local = self._escalados_local
+        total = sum(por_metodo.values())
+        con_red = sum(n for metodo, n in por_metodo.items() if metodo.startswith('comprehend'))
+        endpoint = obtener_endpoint()
+        return {
+            'total': total,
+            'por_metodo': por_metodo,
+            'sin_red': total - con_red,
+            'porcentaje_sin_red': round(100 * (total - con_red) / total, 1) if total else 0.0,
+            'modelo_local': por_metodo.get('modelo_local', 0),
+            'escalados_modelo_local': escalados_local,
+            'endpoint': endpoint.utilizacion() if endpoint is not None else None
+        }
+    
+    def _clasificar_sin_comprehend(self, texto: str) -> Optional[Dict]:
+        """Niveles gratuitos de la cascada; None si hace falta Comprehend"""
         if not texto or len(texto.strip()) < 10:
             return {
                 'clase': 'desconocido',
@@ -32,90 +223,44 @@ class ClasificadorDocumentos:
         if resultado_patron['clase'] != 'desconocido':
             return resultado_patron
         
-        # Solo usar Comprehend si las reglas fallan
-        return self._clasificar_con_comprehend(texto)
+        return self._clasificacion_local(texto)
     
-    def clasificar_lote(self, textos: List[str]) -> List[Dict]:
-        """Clasifica múltiples documentos eficientemente"""
-        resultados = []
+    def _clasificacion_local(self, texto: str) -> Optional[Dict]:
+        """Modelo entrenado con documentos ya clasificados; None si no hay modelo o no es confiable"""
+        modelo = obtener_modelo()
+        if modelo is None:
+            return None
+        
+        try:
+            clase, confianza = modelo.predecir(texto)
+        except Exception as e:
+            print(f"Error en el clasificador local: {e}")
+            return None
         
-        for texto in textos:
-            resultado = self.clasificar_documento(texto)
-            resultados.append(resultado)
+        if confianza < CLASIFICADOR_LOCAL_UMBRAL:
+            # Poca confianza: escalar a Comprehend
+            with self._estadisticas_lock:
+                self._escalados_local += 1
+            return None
         
-        return resultados
+        return {
+            'clase': clase,
+            'confianza': round(confianza, 2),
+            'metodo': 'modelo_local'
+        }
     
     def _clasificacion_rapida(self, texto: str) -> Dict:
         """Reglas simples que cubren el 80% de los casos"""
         texto_lower = texto.lower()
-        
-        # Palabras clave por categoría con pesos
-        keywords = {
-            'contrato': {
-                'keywords': [
-                    'contrato de', 'contrato para', 'contrato n°', 'contrato número',
-                    'contratación', 'convenio', 'acuerdo entre', 'cláusula',
-                    'vigencia', 'partes contratantes', 'objeto del contrato'
-                ],
-                'peso': 1.0
-            },
-            'factura': {
-                'keywords': [
-                    'factura electronica', 'factura n°', 'factura número',
-                    'ruc:', 'igv:', 'importe total', 'valor venta',
-                    'gravada', 'inafecta', 'exonerada', 'detracción'
-                ],
-                'peso': 1.0
-            },
-            'boleta': {
-                'keywords': [
-                    'boleta de venta', 'boleta n°', 'boleta número',
-                    'consumidor final', 'dni:', 'documento identidad',
-                    'boletería', 'venta al contado'
-                ],
-                'peso': 0.9
-            },
-            'demanda': {
-                'keywords': [
-                    'demanda de', 'juzgado', 'demandante', 'demandado',
-                    'proceso judicial', 'recurso', 'sentencia',
-                    'juez', 'tribunal', 'proceso número'
-                ],
-                'peso': 0.9
-            },
-            'estado_cuenta': {
-                'keywords': [
-                    'estado de cuenta', 'extracto bancario', 'tarjeta crédito',
-                    'movimientos', 'saldo disponible', 'banco',
-                    'débitos', 'créditos', 'pago mínimo', 'fecha corte'
-                ],
-                'peso': 0.9
-            },
-            'recibo': {
-                'keywords': [
-                    'recibo de', 'pago de', 'servicio de', 'mes de',
-                    'luz', 'agua', 'teléfono', 'internet',
-                    'servicios públicos', 'suministro'
-                ],
-                'peso': 0.8
-            },
-            'carta_notarial': {
-                'keywords': [
-                    'carta notarial', 'notaría', 'notarial',
-                    'fe pública', 'notificación', 'intimación',
-                    'notario público', 'protocolo notarial'
-                ],
-                'peso': 0.8
-            }
-        }
+        posiciones = self._automata_palabras.primeras_posiciones(texto_lower)
         
         mejor_clase = 'desconocido'
         mejor_puntaje = 0
         
-        for clase, config in keywords.items():
+        for clase, config in self.PALABRAS_CLAVE.items():
             puntaje = 0
             for keyword in config['keywords']:
-                if keyword in texto_lower:
+                if keyword in posiciones:
                     puntaje += config['peso']
             
             if puntaje > mejor_puntaje:
@@ -129,7 +274,13 @@ class ClasificadorDocumentos:
                 'clase': mejor_clase,
                 'confianza': round(confianza, 2),
                 'metodo': 'reglas_rapidas',
-                'puntaje': mejor_puntaje
+                'puntaje': mejor_puntaje,
+                # Qué palabras clave decidieron la clase y dónde aparecen por primera vez
+                'coincidencias': sorted(
+                    ({'keyword': keyword, 'posicion': posiciones[keyword]}
+                     for keyword in self.PALABRAS_CLAVE[mejor_clase]['keywords'] if keyword in posiciones),
+                    key=lambda coincidencia: coincidencia['posicion']
+                )
             }
         
         return {
@@ -140,49 +291,15 @@ class ClasificadorDocumentos:
     
     def _clasificacion_por_patrones(self, texto: str) -> Dict:
         """Patrones regex para casos más específicos"""
-        patrones = {
-            'factura': [
-                (r'RUC\s*:\s*\d{11}', 2.0),
-                (r'FACTURA\s*ELECTRÓNICA\s*:\s*[Ff]\d{3}-\d{1,9}', 2.5),
-                (r'IGV\s*\(\d+%\)\s*:\s*S/\.\s*\d+\.\d{2}', 1.5),
-                (r'N°\s*DE\s*DOCUMENTO\s*:\s*\d{11}', 1.5),
-                (r'OPERACIÓN\s*GRAVADA\s*:\s*S/\.\s*\d+\.\d{2}', 1.0)
-            ],
-            'contrato': [
-                (r'CONTRATO\s*DE\s*[A-Z\s]+\s*N°\s*\d+', 2.0),
-                (r'CLÁUSULA\s*(PRIMERA|SEGUNDA|TERCERA|CUARTA|QUINTA|SEXTA|SÉPTIMA|OCTAVA|NOVENA|DÉCIMA)', 1.5),
-                (r'VIGENCIA\s*:\s*DEL\s*\d{2}/\d{2}/\d{4}\s*AL\s*\d{2}/\d{2}/\d{4}', 1.0),
-                (r'ENTRE\s*[A-Z\s]+\s*Y\s*[A-Z\s]+', 1.0),
-                (r'OBJETO\s*DEL\s*CONTRATO', 1.5)
-            ],
-            'boleta': [
-                (r'BOLETA\s*DE\s*VENTA\s*ELECTRÓNICA\s*:\s*[Bb]\d{3}-\d{1,9}', 2.0),
-                (r'DOCUMENTO\s*DE\s*IDENTIDAD\s*:\s*\d{8}', 1.5),
-                (r'CONSUMIDOR\s*FINAL', 1.0),
-                (r'BOLETA\s*N°\s*\d+', 1.0)
-            ],
-            'estado_cuenta': [
-                (r'TARJETA\s*DE\s*CRÉDITO\s*:\s*\*+\d{4}', 2.0),
-                (r'LÍMITE\s*DE\s*CRÉDITO\s*:\s*S/\.\s*\d+\.\d{2}', 1.5),
-                (r'FECHA\s*DE\s*CORTE\s*:\s*\d{2}/\d{2}/\d{4}', 1.0),
-                (r'PAGO\s*MÍNIMO\s*:\s*S/\.\s*\d+\.\d{2}', 1.0),
-                (r'SALDO\s*ANTERIOR\s*:\s*S/\.\s*\d+\.\d{2}', 1.0)
-            ],
-            'recibo': [
-                (r'RECIBO\s*DE\s*PAGO\s*N°\s*\d+', 1.5),
-                (r'SERVICIO\s*DE\s*(LUZ|AGUA|TELEFONÍA|INTERNET)', 1.0),
-                (r'PERÍODO\s*:\s*\w+\s*\d{4}', 1.0),
-                (r'LECTURA\s*ANTERIOR\s*:\s*\d+', 0.8)
-            ]
-        }
+        presentes = self._escaneo_patrones.presentes(texto)
         
         mejor_clase = 'desconocido'
         mejor_puntaje = 0
         
-        for clase, lista_patrones in patrones.items():
+        for clase, lista_patrones in self.PATRONES.items():
             puntaje_clase = 0
-            for patron, peso in lista_patrones:
-                if re.search(patron, texto, re.IGNORECASE):
+            for i, (_, peso) in enumerate(lista_patrones):
+                if f'{clase}_{i}' in presentes:
                     puntaje_clase += peso
             
             if puntaje_clase > mejor_puntaje:
@@ -205,32 +322,36 @@ class ClasificadorDocumentos:
         }
     
     def _clasificar_con_comprehend(self, texto: str) -> Dict:
-        """Usar Comprehend solo para casos difíciles"""
+        """Usar Comprehend solo para casos difíciles: endpoint propio si hay, si no entidades"""
+        endpoint = obtener_endpoint()
+        if endpoint is not None:
+            resultado = endpoint.clasificar(texto)
+            if resultado is not None:
+                return resultado
+        
+        return self._clasificar_con_entidades(texto)
+    
+    def _clasificar_con_entidades(self, texto: str) -> Dict:
+        """detect_entities + inferencia heurística de la clase"""
         try:
             # Limitar texto para optimizar costos
             texto_limite = texto[:2000]  # Primeros 2000 caracteres
             
             # Detectar entidades con Comprehend
-            respuesta = self.comprehend.detect_entities(
+            respuesta = llamar_aws(
+                'comprehend', self.comprehend.detect_entities,
                 Text=texto_limite,
                 LanguageCode='es'
             )
             
             # Inferir clase basado en entidades
-            inferencia = self._inferir_clase_desde_entidades(respuesta['Entities'])
-            
-            return {
-                'clase': inferencia['clase'],
-                'confianza': inferencia['confianza'],
-                'metodo': 'comprehend_entidades',
-                'entidades': respuesta['Entities'][:5]  # Primeras 5 entidades
-            }
+            return self._resultado_desde_entidades(respuesta['Entities'])
             
         except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'TextSizeLimitExceededException':
                 # Intentar con texto más corto
-                return self._clasificar_con_comprehend(texto[:1000])
+                return self._clasificar_con_entidades(texto[:1000])
             else:
                 return {
                     'clase': 'error_comprehend',
@@ -246,6 +367,65 @@ class ClasificadorDocumentos:
                 'error': str(e)
             }
     
+    def _clasificar_lote_con_comprehend(self, textos: List[str]) -> List[Dict]:
+        """Un batch_detect_entities para hasta 25 textos; errores por documento"""
+        try:
+            respuesta = llamar_aws(
+                'comprehend', self.comprehend.batch_detect_entities,
+                TextList=[texto[:2000] for texto in textos],  # Mismo límite que el camino individual
+                LanguageCode='es'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TextSizeLimitExceededException':
+                return self._clasificar_lote_con_comprehend([texto[:1000] for texto in textos])
+            return [{
+                'clase': 'error_comprehend',
+                'confianza': 0.0,
+                'metodo': 'comprehend_error',
+                'error': str(e)
+            } for _ in textos]
+        except Exception as e:
+            return [{
+                'clase': 'desconocido',
+                'confianza': 0.0,
+                'metodo': 'comprehend_exception',
+                'error': str(e)
+            } for _ in textos]
+        
+        resultados = [None] * len(textos)
+        for item in respuesta.get('ResultList', []):
+            resultados[item['Index']] = self._resultado_desde_entidades(item['Entities'])
+        
+        for error in respuesta.get('ErrorList', []):
+            i = error['Index']
+            if error['ErrorCode'] == 'TextSizeLimitExceededException':
+                # Intentar solo ese documento con texto más corto
+                resultados[i] = self._clasificar_con_entidades(textos[i][:1000])
+            else:
+                resultados[i] = {
+                    'clase': 'error_comprehend',
+                    'confianza': 0.0,
+                    'metodo': 'comprehend_error',
+                    'error': f"{error['ErrorCode']}: {error.get('ErrorMessage', '')}"
+                }
+        
+        # Documento ausente en ambas listas: clasificarlo por separado
+        return [
+            resultado if resultado is not None else self._clasificar_con_entidades(texto)
+            for texto, resultado in zip(textos, resultados)
+        ]
+    
+    def _resultado_desde_entidades(self, entidades: List[Dict]) -> Dict:
+        """Resultado 'comprehend_entidades' a partir de las entidades detectadas"""
+        inferencia = self._inferir_clase_desde_entidades(entidades)
+        
+        return {
+            'clase': inferencia['clase'],
+            'confianza': inferencia['confianza'],
+            'metodo': 'comprehend_entidades',
+            'entidades': entidades[:5]  # Primeras 5 entidades
+        }
+    
     def _inferir_clase_desde_entidades(self, entidades: List[Dict]) -> Dict:
         """Inferir tipo de documento basado en entidades de Comprehend"""
         scores = {
@@ -306,17 +486,36 @@ class ClasificadorDocumentos:
             'confianza': round(confianza, 2)
         }
 
-# Instancia global para reutilizar
-clasificador = ClasificadorDocumentos()
+# Instancia global para reutilizar, creada en el primer uso
+_clasificador = None
+_clasificador_lock = threading.Lock()
+
+def obtener_clasificador() -> ClasificadorDocumentos:
+    """Clasificador compartido por todo el proceso"""
+    global _clasificador
+    with _clasificador_lock:
+        if _clasificador is None:
+            _clasificador = ClasificadorDocumentos()
+        return _clasificador
+
+def __getattr__(nombre):
+    # Compatibilidad con `from utils.comprehend_utils import clasificador`
+    if nombre == 'clasificador':
+        return obtener_clasificador()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 # Funciones de conveniencia
 def clasificar_texto(texto: str) -> Dict:
     """Función simple para clasificar un texto"""
-    return clasificador.clasificar_documento(texto)
+    return obtener_clasificador().clasificar_documento(texto)
 
 def clasificar_multiple_textos(textos: List[str]) -> List[Dict]:
     """Función simple para clasificar múltiples textos"""
-    return clasificador.clasificar_lote(textos)
+    return obtener_clasificador().clasificar_lote(textos)
+
+def estadisticas_clasificacion() -> Dict:
+    """Uso de cada nivel de la cascada desde el arranque del proceso"""
+    return obtener_clasificador().estadisticas()
 
 # Ejemplo de uso
 if __name__ == "__main__":
@@ -333,4 +532,36 @@ if __name__ == "__main__":
         resultado = clasificar_texto(texto)
         print(f"Texto: {texto[:50]}...")
         print(f"Clase: {resultado['clase']} | Confianza: {resultado['confianza']} | Método: {resultado['metodo']}")
-        print("-" * 60)
\ No newline at end of file
+        print("-" * 60)
+    
+    # Micro-benchmark de reglas rápidas sobre un contrato largo (~100 KB):
+    # una búsqueda `in` por palabra clave vs. el autómata compilado
+    import time
+    
+    clausula = (
+        "CLÁUSULA TERCERA: OBLIGACIONES DE LAS PARTES. El LOCADOR se obliga a prestar los servicios "
+        "descritos en el presente documento con la diligencia debida, conforme a los términos de referencia "
+        "aprobados por la entidad, y a entregar los informes mensuales dentro de los plazos establecidos. "
+        "La entidad se compromete a efectuar el pago de la contraprestación previa conformidad del área usuaria. "
+    )
+    contrato_largo = "CONTRATO DE LOCACIÓN DE SERVICIOS N° 045-2024 entre las partes contratantes. " + clausula * 250
+    palabras = [k for config in ClasificadorDocumentos.PALABRAS_CLAVE.values() for k in config['keywords']]
+    repeticiones = 50
+    
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        texto_lower = contrato_largo.lower()
+        presentes_subcadenas = {k for k in palabras if k in texto_lower}
+    tiempo_subcadenas = (time.perf_counter() - inicio) / repeticiones
+    
+    automata = ClasificadorDocumentos._automata_palabras
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        presentes_automata = automata.primeras_posiciones(contrato_largo.lower())
+    tiempo_automata = (time.perf_counter() - inicio) / repeticiones
+    
+    assert presentes_subcadenas == set(presentes_automata)
+    motor = 'pyahocorasick' if automata._automata_c is not None else 'str.find (sin pyahocorasick)'
+    print(f"Contrato de {len(contrato_largo) / 1024:.0f} KB, {len(palabras)} palabras clave:")
+    print(f"  búsquedas 'in':  {tiempo_subcadenas * 1000:.2f} ms")
+    print(f"  autómata:        {tiempo_automata * 1000:.2f} ms ({motor}) · x{tiempo_subcadenas / tiempo_automata:.1f}")
\ No newline at end of file
@@ -0,0 +1,80 @@
+# utils/escaneo_regex.py
+import re
+
+from utils.aho_corasick import AutomataAhoCorasick
+
+_METACARACTERES = set('\\[](){}.*+?|^$')
+_CUANTIFICADORES_OPCIONALES = set('*?{')
+
+
+def _literal_inicial(patron):
+    """Literal con el que empieza toda coincidencia del patrón, o None"""
+    profundidad = 0
+    en_clase = False
+    i = 0
+    while i < len(patron):
+        caracter = patron[i]
+        if caracter == '\\':
+            i += 2
+            continue
+        if en_clase:
+            en_clase = caracter != ']'
+        elif caracter == '[':
+            en_clase = True
+        elif caracter == '(':
+            profundidad += 1
+        elif caracter == ')':
+            profundidad -= 1
+        elif caracter == '|' and profundidad == 0:
+            return None  # Alternancia de primer nivel: no hay un inicio común
+        i += 1
+
+    fin = 0
+    while fin < len(patron) and patron[fin] not in _METACARACTERES:
+        fin += 1
+    if fin < len(patron) and patron[fin] in _CUANTIFICADORES_OPCIONALES:
+        fin -= 1  # El último carácter es opcional
+    return patron[:fin] or None
+
+
+class EscaneoRegex:
+    """Varios patrones regex evaluados con un solo recorrido del texto.
+
+    Compila cada patrón una vez y extrae el literal con el que empieza (p. ej.
+    'RUC' en r'RUC\\s*:\\s*\\d{11}'). Un autómata Aho-Corasick recorre el texto
+    una vez buscando todos esos literales, y cada patrón se prueba con `match`
+    solo donde aparece el suyo, en vez de un re.search sobre todo el texto por
+    patrón. Los patrones sin literal inicial se buscan completos.
+    """
+
+    def __init__(self, patrones, flags=0):
+        self.nombres = [nombre for nombre, _ in patrones]
+        self.compilados = {nombre: re.compile(patron, flags) for nombre, patron in patrones}
+        self._minusculas = bool(flags & re.IGNORECASE)
+        self.anclas = {}
+        for nombre, patron in patrones:
+            ancla = _literal_inicial(patron)
+            self.anclas[nombre] = ancla.lower() if ancla and self._minusculas else ancla
+        self._automata = AutomataAhoCorasick(ancla for ancla in self.anclas.values() if ancla)
+
+    def presentes(self, texto):
+        """Nombres de los patrones que tienen alguna coincidencia en el texto"""
+        texto_anclas = texto.lower() if self._minusculas else texto
+        posiciones = {}
+        # lower() puede cambiar la longitud (p. ej. 'İ'): las posiciones ya no servirían
+        alineado = len(texto_anclas) == len(texto)
+        if alineado:
+            for posicion, ancla in self._automata.buscar(texto_anclas):
+                posiciones.setdefault(ancla, []).append(posicion)
+
+        encontrados = set()
+        for nombre in self.nombres:
+            regex = self.compilados[nombre]
+            ancla = self.anclas[nombre]
+            if ancla is None or not alineado:
+                coincide = regex.search(texto) is not None
+            else:
+                coincide = any(regex.match(texto, posicion) for posicion in posiciones.get(ancla, ()))
+            if coincide:
+                encontrados.add(nombre)
+        return encontrados
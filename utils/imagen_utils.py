@@ -0,0 +1,80 @@
+# utils/imagen_utils.py
+import io
+import os
+import time
+
+# Lado mayor tras reducir: ~300 DPI para un A4 (2480 x 3508), suficiente para OCR
+IMAGEN_LADO_MAX = int(os.getenv("IMAGEN_LADO_MAX", "3508"))
+IMAGEN_CALIDAD_JPEG = int(os.getenv("IMAGEN_CALIDAD_JPEG", "85"))
+IMAGEN_ESCALA_GRISES = os.getenv("IMAGEN_ESCALA_GRISES", "1") == "1"
+IMAGEN_PREPROCESO_WORKERS = int(os.getenv("IMAGEN_PREPROCESO_WORKERS", "4"))
+
+LIMITE_BYTES_SINCRONO = 10 * 1024 * 1024  # Límite de Textract para Document.Bytes
+_CALIDAD_MINIMA = 50
+
+# Formatos de imagen que acepta Textract (JPEG, PNG y TIFF)
+EXTENSIONES_IMAGEN = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+
+def es_imagen(nombre):
+    return nombre.lower().endswith(EXTENSIONES_IMAGEN)
+
+
+def _codificar_jpeg(imagen, calidad):
+    salida = io.BytesIO()
+    imagen.save(salida, format='JPEG', quality=calidad, optimize=True)
+    return salida.getvalue()
+
+
+def preprocesar_imagen(datos, lado_max=None, calidad=None, escala_grises=None, limite_bytes=LIMITE_BYTES_SINCRONO):
+    """Prepara una imagen para analyze_document y devuelve (bytes, métricas).
+
+    Aplica la rotación EXIF, reduce el lado mayor a `lado_max`, pasa a escala de
+    grises y recomprime en JPEG. Si el resultado sigue por encima de `limite_bytes`
+    baja la calidad y luego la resolución. Conserva los bytes originales cuando
+    ya cumplen el límite y el procesado no los achica.
+    """
+    from PIL import Image, ImageOps  # Diferido: solo se carga si hay imágenes
+
+    lado_max = lado_max or IMAGEN_LADO_MAX
+    calidad = calidad or IMAGEN_CALIDAD_JPEG
+    escala_grises = IMAGEN_ESCALA_GRISES if escala_grises is None else escala_grises
+    inicio = time.perf_counter()
+    metricas = {'bytes_originales': len(datos), 'aplicado': False}
+
+    try:
+        imagen = Image.open(io.BytesIO(datos))
+        metricas['dimensiones_originales'] = imagen.size
+        # Orientación EXIF (0x0112) distinta de 1: hay que girar los píxeles
+        girada = imagen.getexif().get(0x0112, 1) != 1
+        imagen = ImageOps.exif_transpose(imagen)
+        if escala_grises:
+            imagen = imagen.convert('L')
+        elif imagen.mode not in ('RGB', 'L'):
+            imagen = imagen.convert('RGB')
+        if max(imagen.size) > lado_max:
+            imagen.thumbnail((lado_max, lado_max), Image.LANCZOS)
+
+        salida = _codificar_jpeg(imagen, calidad)
+        while len(salida) > limite_bytes and calidad > _CALIDAD_MINIMA:
+            calidad = max(_CALIDAD_MINIMA, calidad - 15)
+            salida = _codificar_jpeg(imagen, calidad)
+        while len(salida) > limite_bytes and min(imagen.size) > 500:
+            imagen = imagen.resize((int(imagen.width * 0.8), int(imagen.height * 0.8)), Image.LANCZOS)
+            salida = _codificar_jpeg(imagen, calidad)
+    except Exception as e:
+        metricas.update({'bytes_finales': len(datos), 'bytes_ahorrados': 0, 'error': str(e),
+                         'segundos': round(time.perf_counter() - inicio, 3)})
+        return datos, metricas
+
+    if len(salida) >= len(datos) and len(datos) <= limite_bytes and not girada:
+        salida = datos
+    else:
+        metricas.update({'aplicado': True, 'dimensiones_finales': imagen.size, 'calidad_jpeg': calidad})
+
+    metricas.update({
+        'bytes_finales': len(salida),
+        'bytes_ahorrados': len(datos) - len(salida),
+        'segundos': round(time.perf_counter() - inicio, 3)
+    })
+    return salida, metricas
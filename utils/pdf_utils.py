@@ -0,0 +1,136 @@
+# utils/pdf_utils.py
+import io
+import re
+
+from PyPDF2 import PdfReader, PdfWriter
+
+_RE_SEPARADOR_COLUMNAS = re.compile(r'\S(?: {2,}|\t)(?=\S)')
+_RE_NUMERO = re.compile(r'(?<![\w.,])\d[\d.,]*(?![\w])')
+_RE_CAMPO = re.compile(r'^[ \t]*[^\W\d][^:\n]{1,40}:[ \t]*\S', re.MULTILINE)
+
+
+def _lector(pdf):
+    """Crea un PdfReader desde bytes o un archivo abierto (rebobinado)"""
+    if isinstance(pdf, PdfReader):
+        return pdf
+    if isinstance(pdf, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(pdf))
+    pdf.seek(0)
+    return PdfReader(pdf)
+
+
+def abrir_lector(pdf):
+    """PdfReader del documento, o None si PyPDF2 no puede leerlo.
+
+    El lector lee del archivo a demanda: un mismo lector sirve para la sonda, el
+    conteo, la capa de texto y la división sin volver a parsear el PDF.
+    """
+    try:
+        lector = _lector(pdf)
+        len(lector.pages)
+        return lector
+    except Exception:
+        return None
+
+
+def contar_paginas(pdf):
+    """Número de páginas de un PDF; 0 si no se puede leer. Deja el archivo donde estaba"""
+    posicion = pdf.tell() if hasattr(pdf, 'tell') else None
+    try:
+        return len(_lector(pdf).pages)
+    except Exception:
+        return 0
+    finally:
+        if posicion is not None:
+            pdf.seek(posicion)
+
+
+def construir_pdf(pdf, indices):
+    """Bytes de un PDF nuevo con solo las páginas indicadas (base 0)"""
+    lector = _lector(pdf)
+    writer = PdfWriter()
+    for indice in indices:
+        writer.add_page(lector.pages[indice])
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+def dividir_en_paginas(pdf, indices=None):
+    """Lista con los bytes de un PDF de una sola página por cada página (o por cada índice)"""
+    lector = _lector(pdf)
+    indices = range(len(lector.pages)) if indices is None else indices
+    return [construir_pdf(lector, [indice]) for indice in indices]
+
+
+def extraer_capa_texto(pdf):
+    """Texto embebido de cada página ('' si la página no tiene o falla la extracción).
+
+    Un solo lector recorre las páginas en serie: PyPDF2 es Python puro y con el GIL
+    varios hilos no extraen en paralelo, solo volverían a parsear el PDF cada uno.
+    """
+    try:
+        lector = _lector(pdf)
+        total = len(lector.pages)
+    except Exception:
+        return []
+    textos = []
+    for indice in range(total):
+        try:
+            textos.append(lector.pages[indice].extract_text() or '')
+        except Exception:
+            textos.append('')
+    return textos
+
+
+def capa_texto_utilizable(texto, min_caracteres=80):
+    """True si la página trae texto embebido legible (no escaneada ni mal codificada)"""
+    limpio = texto.strip()
+    if len(limpio) < min_caracteres:
+        return False
+    # Fuentes sin mapa Unicode producen caracteres de reemplazo o basura
+    if limpio.count('\ufffd') > len(limpio) * 0.01:
+        return False
+    legibles = sum(1 for c in limpio if c.isalnum() or c.isspace() or c in '.,;:-/()$%°"\'')
+    if legibles / len(limpio) < 0.85:
+        return False
+    # Texto espaciado letra por letra ("F A C T U R A") no sirve como capa de texto
+    palabras = limpio.split()
+    largo_medio = sum(len(p) for p in palabras) / len(palabras)
+    return largo_medio >= 2.5
+
+
+def parece_tabla(texto, min_lineas=3):
+    """Heurística: varias líneas con columnas separadas o con 3+ valores numéricos"""
+    lineas_tabulares = 0
+    for linea in texto.splitlines():
+        columnas = len(_RE_SEPARADOR_COLUMNAS.findall(linea.strip()))
+        numeros = len(_RE_NUMERO.findall(linea))
+        if columnas >= 2 or numeros >= 3:
+            lineas_tabulares += 1
+    return lineas_tabulares >= min_lineas
+
+
+def parece_formulario(texto, min_campos=4):
+    """Heurística: varias líneas del tipo 'Campo: valor'"""
+    return len(_RE_CAMPO.findall(texto)) >= min_campos
+
+
+def planificar_paginas(textos, necesita_tablas=True, necesita_formularios=True):
+    """Ruta por página: 'texto_nativo' si la capa de texto basta, si no 'textract'"""
+    rutas = []
+    for texto in textos:
+        nativa = (capa_texto_utilizable(texto)
+                  and not (necesita_tablas and parece_tabla(texto))
+                  and not (necesita_formularios and parece_formulario(texto)))
+        rutas.append('texto_nativo' if nativa else 'textract')
+    return rutas
+
+
+def texto_primera_pagina(pdf):
+    """Capa de texto de la primera página ('' si no tiene o no se puede leer)"""
+    try:
+        lector = _lector(pdf)
+        return lector.pages[0].extract_text() or '' if lector.pages else ''
+    except Exception:
+        return ''
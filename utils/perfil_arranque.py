@@ -0,0 +1,80 @@
+# utils/perfil_arranque.py
+"""Perfil del tiempo de importación (arranque en frío) a partir de `python -X importtime`.
+
+Uso:
+    python -m utils.perfil_arranque utils.textract_utils utils.comprehend_utils --presupuesto-ms 400
+
+Termina con código 1 si algún módulo supera el presupuesto, de modo que puede
+usarse como verificación en CI o en un test (`verificar_presupuesto`).
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS_DEFAULT = ['utils.textract_utils', 'utils.comprehend_utils', 'utils.bedrock_agents']
+PRESUPUESTO_MS_DEFAULT = float(os.getenv("ARRANQUE_PRESUPUESTO_MS", "500"))
+
+
+def perfil_importacion(modulo, python=None):
+    """Importa `modulo` en un intérprete limpio y devuelve el desglose por módulo.
+
+    Devuelve {'modulo', 'total_ms', 'detalle'} donde `detalle` es una lista de
+    (nombre, propio_ms, acumulado_ms) ordenada por tiempo acumulado descendente.
+    """
+    proceso = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ_REPO, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}: {proceso.stderr.strip().splitlines()[-1:]}")
+
+    detalle = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        partes = linea[len('import time:'):].split('|')
+        try:
+            propio, acumulado = int(partes[0]), int(partes[1])
+        except ValueError:
+            continue  # Cabecera "self [us] | cumulative | imported package"
+        detalle.append((partes[2].strip(), propio / 1000, acumulado / 1000))
+
+    total = next((acumulado for nombre, _, acumulado in detalle if nombre == modulo), 0.0)
+    detalle.sort(key=lambda fila: fila[2], reverse=True)
+    return {'modulo': modulo, 'total_ms': total, 'detalle': detalle}
+
+
+def verificar_presupuesto(modulo, presupuesto_ms=PRESUPUESTO_MS_DEFAULT):
+    """AssertionError si importar `modulo` en frío tarda más que `presupuesto_ms`"""
+    perfil = perfil_importacion(modulo)
+    assert perfil['total_ms'] <= presupuesto_ms, (
+        f"{modulo} tarda {perfil['total_ms']:.0f} ms en importarse (presupuesto {presupuesto_ms:.0f} ms)"
+    )
+    return perfil['total_ms']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de importación en frío")
+    parser.add_argument('modulos', nargs='*', default=MODULOS_DEFAULT)
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS_DEFAULT)
+    parser.add_argument('--top', type=int, default=10, help="Módulos más caros a mostrar")
+    args = parser.parse_args(argv)
+
+    excedidos = []
+    for modulo in args.modulos:
+        perfil = perfil_importacion(modulo)
+        estado = 'OK' if perfil['total_ms'] <= args.presupuesto_ms else 'EXCEDIDO'
+        print(f"{modulo}: {perfil['total_ms']:.1f} ms [{estado}]")
+        for nombre, propio, acumulado in [f for f in perfil['detalle'] if f[0] != modulo][:args.top]:
+            print(f"    {acumulado:9.1f} ms acumulado  {propio:8.1f} ms propio  {nombre}")
+        if estado != 'OK':
+            excedidos.append(modulo)
+
+    return 1 if excedidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
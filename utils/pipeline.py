@@ -0,0 +1,165 @@
+# utils/pipeline.py
+import os
+import queue
+import threading
+import time
+
+# Marcador de fin de cola para los workers de cada etapa
+_FIN = object()
+
+MAX_EN_VUELO_DEFAULT = int(os.getenv("PIPELINE_MAX_EN_VUELO", "8"))
+
+# Cada cuánto revisan los hilos bloqueados si el consumidor abandonó el lote
+INTERVALO_PARADA = 0.1
+
+
+def poner_o_detener(cola, item, detener):
+    """put bloqueante que se rinde si `detener` se activa; True si el item entró"""
+    while not detener.is_set():
+        try:
+            cola.put(item, timeout=INTERVALO_PARADA)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+class Etapa:
+    """Describe una etapa del pipeline: nombre, función y tamaño de su pool"""
+
+    def __init__(self, nombre, funcion, workers=2, capacidad=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.workers = max(1, workers)
+        # Cola acotada = backpressure sobre la etapa anterior
+        self.capacidad = capacidad or self.workers * 2
+
+
+class _Fallo:
+    """Envuelve la excepción de un item para que salte las etapas restantes"""
+
+    def __init__(self, valor, error, etapa):
+        self.valor = valor
+        self.error = error
+        self.etapa = etapa
+
+
+class PipelineEtapas:
+    """Pipeline concurrente por etapas con pools acotados y orden de entrada preservado"""
+
+    def __init__(self, etapas, max_en_vuelo=MAX_EN_VUELO_DEFAULT, al_fallar=None, planificador=None):
+        if not etapas:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.etapas = etapas
+        self.max_en_vuelo = max(1, max_en_vuelo)
+        # al_fallar(valor, error, nombre_etapa) -> valor de reemplazo que sigue a la etapa
+        # siguiente; corre en el worker de la etapa que falló, no en el consumidor
+        self.al_fallar = al_fallar
+        # planificador.ordenar(items) -> (idx, item) en orden de despacho; None = orden de entrada
+        self.planificador = planificador
+        # idx -> {'espera_cola', 'servicio'} en segundos, del último lote
+        self.tiempos = {}
+
+    def ejecutar(self, items):
+        """Procesa todos los items y devuelve los resultados en orden de entrada"""
+        items = list(items)
+        resultados = [None] * len(items)
+        for idx, resultado in self.iterar(items):
+            resultados[idx] = resultado
+        return resultados
+
+    def iterar(self, items):
+        """Genera (indice, resultado) a medida que cada item termina todas las etapas.
+
+        Si el consumidor deja de iterar (rerun de Streamlit, excepción, close()),
+        el alimentador y los workers se detienen: terminan la llamada en curso,
+        descartan el resto y salen, sin quedar bloqueados en colas llenas.
+        """
+        items = list(items)
+        if not items:
+            return
+
+        en_vuelo = threading.BoundedSemaphore(self.max_en_vuelo)
+        detener = threading.Event()
+        self.tiempos = {}
+        despachos = {}
+        inicio = time.monotonic()
+        colas = [queue.Queue(maxsize=etapa.capacidad) for etapa in self.etapas]
+        salida = queue.Queue()
+
+        for pos, etapa in enumerate(self.etapas):
+            siguiente = colas[pos + 1] if pos + 1 < len(colas) else salida
+            for n in range(etapa.workers):
+                threading.Thread(
+                    target=self._worker,
+                    args=(etapa, colas[pos], siguiente, detener),
+                    name=f"pipeline-{etapa.nombre}-{n}",
+                    daemon=True
+                ).start()
+
+        def alimentar():
+            orden = self.planificador.ordenar(items) if self.planificador else enumerate(items)
+            while not detener.is_set():
+                # Elegir el siguiente documento recién cuando hay un hueco libre
+                if not en_vuelo.acquire(timeout=INTERVALO_PARADA):
+                    continue
+                paquete = next(orden, None)
+                if paquete is None:
+                    en_vuelo.release()
+                    break
+                despachos[paquete[0]] = time.monotonic()
+                if not poner_o_detener(colas[0], paquete, detener):
+                    return
+            # Cierre en cascada: cada etapa propaga el fin cuando su cola se vacía
+            for _ in range(self.etapas[0].workers):
+                poner_o_detener(colas[0], _FIN, detener)
+
+        threading.Thread(target=alimentar, name="pipeline-alimentador", daemon=True).start()
+
+        try:
+            pendientes = len(items)
+            while pendientes:
+                idx, valor = salida.get()
+                en_vuelo.release()
+                self.tiempos[idx] = {
+                    'espera_cola': despachos[idx] - inicio,
+                    'servicio': time.monotonic() - despachos[idx]
+                }
+                pendientes -= 1
+                if isinstance(valor, _Fallo):
+                    raise valor.error
+                yield idx, valor
+
+            # Avisar fin a las etapas siguientes para liberar sus hilos
+            for pos in range(1, len(self.etapas)):
+                for _ in range(self.etapas[pos].workers):
+                    colas[pos].put(_FIN)
+        finally:
+            # Lote completo o abandonado: ningún hilo debe quedar esperando
+            detener.set()
+
+    def _worker(self, etapa, entrada, siguiente, detener):
+        while not detener.is_set():
+            try:
+                paquete = entrada.get(timeout=INTERVALO_PARADA)
+            except queue.Empty:
+                continue
+            if paquete is _FIN:
+                return
+            idx, valor = paquete
+            if not isinstance(valor, _Fallo):
+                try:
+                    valor = etapa.funcion(valor)
+                except Exception as e:
+                    valor = self._reemplazar(valor, e, etapa.nombre)
+            if not poner_o_detener(siguiente, (idx, valor), detener):
+                return
+
+    def _reemplazar(self, valor, error, nombre_etapa):
+        """Valor de reemplazo de al_fallar, o _Fallo para que salte las etapas restantes"""
+        if self.al_fallar is None:
+            return _Fallo(valor, error, nombre_etapa)
+        try:
+            return self.al_fallar(valor, error, nombre_etapa)
+        except Exception as e:
+            return _Fallo(valor, e, nombre_etapa)
@@ -0,0 +1,35 @@
+# utils/planificador_textract.py
+from utils.pdf_utils import parece_formulario, parece_tabla
+
+# FeatureTypes que cada modo de app.py aprovecha realmente.
+# Lista vacía = solo texto (detect_document_text / start_document_text_detection)
+FEATURES_POR_MODO = {
+    'contratos': [],
+    'publicidad': [],
+    'facturas': ['TABLES', 'FORMS'],
+    'general': ['TABLES', 'FORMS'],
+}
+
+# Modos en los que una sonda de la capa de texto puede recortar las features
+MODOS_CON_SONDA = {'publicidad', 'facturas', 'general'}
+
+
+def planificar_features(modo, texto_muestra=None):
+    """Elige el conjunto de FeatureTypes más barato para un documento.
+
+    `texto_muestra` es la capa de texto del documento (si existe), que debe
+    representarlo entero: hoy solo se pasa en PDF de una página. Sin muestra se
+    usa el conjunto por defecto del modo; con muestra solo se piden TABLES/FORMS
+    cuando la página realmente parece tener tablas o formularios.
+    """
+    base = FEATURES_POR_MODO.get(modo, FEATURES_POR_MODO['general'])
+    if modo not in MODOS_CON_SONDA or not texto_muestra or not texto_muestra.strip():
+        return list(base)
+
+    features = []
+    if parece_tabla(texto_muestra):
+        features.append('TABLES')
+    # Publicidad solo necesita líneas: a lo sumo tablas de pauta
+    if modo != 'publicidad' and parece_formulario(texto_muestra):
+        features.append('FORMS')
+    return features
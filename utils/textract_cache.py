@@ -0,0 +1,149 @@
+# utils/textract_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+from utils.textract_tablas import TablaTextract, como_tabla
+
+# Formato de las entradas; cambiarlo invalida las claves de las entradas anteriores
+VERSION_CACHE = 2
+
+
+def _sufijo_clave(feature_types):
+    return f"|{','.join(sorted(feature_types or []))}|v{VERSION_CACHE}".encode('utf-8')
+
+
+def clave_contenido(file_bytes, feature_types):
+    """SHA-256 de los bytes del archivo más las FeatureTypes solicitadas"""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(_sufijo_clave(feature_types))
+    return digest.hexdigest()
+
+
+def clave_contenido_archivo(fileobj, feature_types, tamano_bloque=1024 * 1024):
+    """Igual que clave_contenido pero leyendo el archivo por bloques; deja la posición intacta"""
+    posicion = fileobj.tell()
+    digest = hashlib.sha256()
+    for bloque in iter(lambda: fileobj.read(tamano_bloque), b''):
+        digest.update(bloque)
+    fileobj.seek(posicion)
+    digest.update(_sufijo_clave(feature_types))
+    return digest.hexdigest()
+
+
+def _tabla_a_json(tabla):
+    return como_tabla(tabla).a_json()
+
+
+def _tabla_desde_json(data):
+    return TablaTextract.desde_json(data)
+
+
+class CacheTextract:
+    """Caché en disco de resultados parseados de Textract, direccionada por contenido.
+
+    Cada entrada es un JSON con texto, tablas, formularios y páginas. El tamaño
+    total se acota expulsando las entradas usadas hace más tiempo (LRU por mtime).
+    """
+
+    def __init__(self, directorio, max_bytes):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._total = 0
+        self.estadisticas = {'hits': 0, 'misses': 0, 'escrituras': 0, 'expulsiones': 0}
+        os.makedirs(directorio, exist_ok=True)
+        self._indexar()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], f"{clave}.json")
+
+    def _indexar(self):
+        """Reconstruye el índice tamaño/último uso a partir de los archivos existentes"""
+        for raiz, _, archivos in os.walk(self.directorio):
+            for nombre in archivos:
+                if nombre.endswith('.json'):
+                    stat = os.stat(os.path.join(raiz, nombre))
+                    self._entradas[nombre[:-5]] = [stat.st_size, stat.st_mtime]
+                    self._total += stat.st_size
+
+    def obtener(self, clave):
+        """Devuelve el resultado cacheado o None"""
+        ruta = self._ruta(clave)
+        with self._lock:
+            if clave not in self._entradas:
+                self.estadisticas['misses'] += 1
+                return None
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                ahora = time.time()
+                os.utime(ruta, (ahora, ahora))
+                self._entradas[clave][1] = ahora
+            except (OSError, ValueError):
+                self._descartar(clave)
+                self.estadisticas['misses'] += 1
+                return None
+            self.estadisticas['hits'] += 1
+
+        data['tables'] = [_tabla_desde_json(t) for t in data.get('tables', [])]
+        return data
+
+    def guardar(self, clave, resultado):
+        """Guarda text/tables/forms/pages/s3_uri de un resultado parseado"""
+        data = {
+            's3_uri': resultado.get('s3_uri', ''),
+            'text': resultado.get('text', ''),
+            'tables': [_tabla_a_json(t) for t in resultado.get('tables', [])],
+            'forms': resultado.get('forms', {}),
+            'pages': resultado.get('pages', 1)
+        }
+        contenido = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        if len(contenido) > self.max_bytes:
+            return
+
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+
+        with self._lock:
+            if clave in self._entradas:
+                self._total -= self._entradas[clave][0]
+            self._entradas[clave] = [len(contenido), time.time()]
+            self._total += len(contenido)
+            self.estadisticas['escrituras'] += 1
+            self._expulsar()
+
+    def _expulsar(self):
+        if self._total <= self.max_bytes:
+            return
+        for clave, _ in sorted(self._entradas.items(), key=lambda item: item[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            self._descartar(clave)
+            self.estadisticas['expulsiones'] += 1
+
+    def _descartar(self, clave):
+        tamano, _ = self._entradas.pop(clave, (0, 0))
+        self._total -= tamano
+        try:
+            os.remove(self._ruta(clave))
+        except OSError:
+            pass
+
+    def resumen(self):
+        """Estadísticas de uso: hits, misses, tasa de acierto y ocupación"""
+        with self._lock:
+            consultas = self.estadisticas['hits'] + self.estadisticas['misses']
+            return {
+                **self.estadisticas,
+                'tasa_acierto': round(self.estadisticas['hits'] / consultas, 3) if consultas else 0.0,
+                'entradas': len(self._entradas),
+                'bytes': self._total
+            }
@@ -0,0 +1,168 @@
+# utils/textract_columnar.py
+import sys
+
+_SIN_VALOR = -1
+
+
+class BloquesColumnares:
+    """Almacén compacto de bloques Textract en arreglos paralelos (NumPy).
+
+    Cada bloque es un índice entero. Tipo, página, confianza, bounding box y
+    posición de celda viven en arreglos; el texto se interna (cada cadena
+    distinta se guarda una vez) y las relaciones CHILD/VALUE se guardan en
+    formato CSR (punteros + índices), sin los Ids ni la Geometry anidada.
+    Los accesores replican los de GrafoBloques, pero reciben y devuelven índices.
+    """
+
+    def __init__(self, blocks):
+        import numpy as np  # Diferido: solo se carga si se conservan bloques
+
+        blocks = list(blocks)
+        n = len(blocks)
+        posicion = {block['Id']: i for i, block in enumerate(blocks)}
+
+        self.tipos = []
+        codigos_tipo = {}
+        textos = {}
+        self.textos = []
+
+        self.tipo = np.empty(n, dtype=np.uint8)
+        self.pagina = np.empty(n, dtype=np.int32)
+        self.confianza = np.full(n, np.nan, dtype=np.float32)
+        self.bbox = np.full((n, 4), np.nan, dtype=np.float32)  # left, top, width, height
+        self.texto_idx = np.full(n, _SIN_VALOR, dtype=np.int32)
+        self.fila = np.zeros(n, dtype=np.int32)
+        self.columna = np.zeros(n, dtype=np.int32)
+        self.es_clave = np.zeros(n, dtype=bool)
+
+        hijos_ptr = [0]
+        hijos = []
+        valor_ptr = [0]
+        valor = []
+
+        for i, block in enumerate(blocks):
+            nombre_tipo = block['BlockType']
+            codigo = codigos_tipo.get(nombre_tipo)
+            if codigo is None:
+                codigo = codigos_tipo[nombre_tipo] = len(self.tipos)
+                self.tipos.append(nombre_tipo)
+            self.tipo[i] = codigo
+            self.pagina[i] = block.get('Page', 1)
+            if 'Confidence' in block:
+                self.confianza[i] = block['Confidence']
+            caja = block.get('Geometry', {}).get('BoundingBox')
+            if caja:
+                self.bbox[i] = (caja.get('Left', 0), caja.get('Top', 0), caja.get('Width', 0), caja.get('Height', 0))
+            if 'Text' in block:
+                texto = block['Text']
+                indice = textos.get(texto)
+                if indice is None:
+                    indice = textos[texto] = len(self.textos)
+                    self.textos.append(texto)
+                self.texto_idx[i] = indice
+            self.fila[i] = block.get('RowIndex', 0)
+            self.columna[i] = block.get('ColumnIndex', 0)
+            self.es_clave[i] = 'KEY' in block.get('EntityTypes', ())
+
+            for relationship in block.get('Relationships', []):
+                destino = hijos if relationship['Type'] == 'CHILD' else valor if relationship['Type'] == 'VALUE' else None
+                if destino is not None:
+                    destino.extend(posicion[j] for j in relationship['Ids'] if j in posicion)
+            hijos_ptr.append(len(hijos))
+            valor_ptr.append(len(valor))
+
+        self.hijos_ptr = np.array(hijos_ptr, dtype=np.int32)
+        self.hijos_idx = np.array(hijos, dtype=np.int32)
+        self.valor_ptr = np.array(valor_ptr, dtype=np.int32)
+        self.valor_idx = np.array(valor, dtype=np.int32)
+        self._texto = {}
+
+        self.paginas = self._indices_de('PAGE')
+        self.lineas = self._indices_de('LINE')
+        self.tablas = self._indices_de('TABLE')
+        self.celdas = self._indices_de('CELL')
+        kv = self._indices_de('KEY_VALUE_SET')
+        self.claves = [i for i in kv if self.es_clave[i]]
+        self.valores = [i for i in kv if not self.es_clave[i]]
+
+    def _indices_de(self, nombre_tipo):
+        if nombre_tipo not in self.tipos:
+            return []
+        return [int(i) for i in (self.tipo == self.tipos.index(nombre_tipo)).nonzero()[0]]
+
+    def __len__(self):
+        return len(self.tipo)
+
+    def tipo_de(self, i):
+        return self.tipos[self.tipo[i]]
+
+    def texto_propio(self, i):
+        indice = self.texto_idx[i]
+        return self.textos[indice] if indice != _SIN_VALOR else None
+
+    def relacionados(self, i, tipo='CHILD'):
+        """Índices relacionados (CHILD o VALUE) del bloque i"""
+        if tipo == 'CHILD':
+            return [int(j) for j in self.hijos_idx[self.hijos_ptr[i]:self.hijos_ptr[i + 1]]]
+        if tipo == 'VALUE':
+            return [int(j) for j in self.valor_idx[self.valor_ptr[i]:self.valor_ptr[i + 1]]]
+        return []
+
+    def texto(self, i):
+        """Texto del bloque más el de sus hijos directos (memoizado)"""
+        texto = self._texto.get(i)
+        if texto is None:
+            partes = [self.texto_propio(j) for j in [i] + self.relacionados(i, 'CHILD')]
+            texto = ' '.join(p for p in partes if p is not None).strip()
+            self._texto[i] = texto
+        return texto
+
+    def liberar_memo(self):
+        """Descarta los textos memoizados por `texto`; se recalculan si se vuelven a pedir"""
+        self._texto = {}
+
+    def valor_de_clave(self, i):
+        for j in self.relacionados(i, 'VALUE'):
+            return self.texto(j)
+        return ""
+
+    def celdas_de_tabla(self, i):
+        codigo_celda = self.tipos.index('CELL') if 'CELL' in self.tipos else _SIN_VALOR
+        return [j for j in self.relacionados(i, 'CHILD') if self.tipo[j] == codigo_celda]
+
+    def posicion_celda(self, i):
+        """(RowIndex, ColumnIndex) de una celda, base 1"""
+        return int(self.fila[i]), int(self.columna[i])
+
+    def texto_lineas(self):
+        return [self.texto_propio(i) or '' for i in self.lineas]
+
+    def formularios(self):
+        forms = {}
+        for i in self.claves:
+            key_text = self.texto(i)
+            if key_text and key_text.strip():
+                forms[key_text] = self.valor_de_clave(i)
+        return forms
+
+    def bytes_memoria(self):
+        """Memoria ocupada por los arreglos, los textos internados y el memo de `texto`"""
+        arreglos = (self.tipo, self.pagina, self.confianza, self.bbox, self.texto_idx, self.fila,
+                    self.columna, self.es_clave, self.hijos_ptr, self.hijos_idx, self.valor_ptr, self.valor_idx)
+        return (sum(a.nbytes for a in arreglos)
+                + sys.getsizeof(self.textos) + sum(sys.getsizeof(t) for t in self.textos)
+                + bytes_profundos(self._texto))
+
+
+def bytes_profundos(objeto, vistos=None):
+    """Memoria aproximada de una estructura JSON (dicts/listas/cadenas anidadas)"""
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        total += sum(bytes_profundos(k, vistos) + bytes_profundos(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple)):
+        total += sum(bytes_profundos(v, vistos) for v in objeto)
+    return total
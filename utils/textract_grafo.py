@@ -0,0 +1,94 @@
+# utils/textract_grafo.py
+
+
+class GrafoBloques:
+    """Grafo de bloques de una respuesta Textract indexado por Id.
+
+    Se construye en una sola pasada: índice Id -> bloque, vistas por tipo
+    (PAGE/LINE/TABLE/CELL/KEY_VALUE_SET) y caché del texto de cada bloque,
+    de modo que resolver una relación es O(1) en lugar de recorrer la lista.
+    """
+
+    def __init__(self, blocks):
+        self.por_id = {}
+        self.paginas = []
+        self.lineas = []
+        self.tablas = []
+        self.celdas = []
+        self.claves = []
+        self.valores = []
+        self._texto = {}
+
+        for block in blocks:
+            self.por_id[block['Id']] = block
+            block_type = block['BlockType']
+            if block_type == 'LINE':
+                self.lineas.append(block)
+            elif block_type == 'PAGE':
+                self.paginas.append(block)
+            elif block_type == 'TABLE':
+                self.tablas.append(block)
+            elif block_type == 'CELL':
+                self.celdas.append(block)
+            elif block_type == 'KEY_VALUE_SET':
+                if 'KEY' in block.get('EntityTypes', []):
+                    self.claves.append(block)
+                else:
+                    self.valores.append(block)
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def ids_relacionados(self, block, tipo='CHILD'):
+        """Ids de las relaciones de un tipo dado (CHILD, VALUE, ...)"""
+        ids = []
+        for relationship in block.get('Relationships', []):
+            if relationship['Type'] == tipo:
+                ids.extend(relationship['Ids'])
+        return ids
+
+    def relacionados(self, block, tipo='CHILD'):
+        """Bloques relacionados que existen en la respuesta"""
+        por_id = self.por_id
+        return [por_id[i] for i in self.ids_relacionados(block, tipo) if i in por_id]
+
+    def texto(self, block):
+        """Texto del bloque más el de sus hijos directos (memoizado por Id)"""
+        block_id = block['Id']
+        texto = self._texto.get(block_id)
+        if texto is None:
+            partes = []
+            if 'Text' in block:
+                partes.append(block['Text'])
+            for hijo in self.relacionados(block, 'CHILD'):
+                if 'Text' in hijo:
+                    partes.append(hijo['Text'])
+            texto = ' '.join(partes).strip()
+            self._texto[block_id] = texto
+        return texto
+
+    def valor_de_clave(self, key_block):
+        """Texto del VALUE asociado a un bloque KEY"""
+        for value_block in self.relacionados(key_block, 'VALUE'):
+            return self.texto(value_block)
+        return ""
+
+    def celdas_de_tabla(self, table_block):
+        """Celdas hijas de un bloque TABLE"""
+        return [b for b in self.relacionados(table_block, 'CHILD') if b['BlockType'] == 'CELL']
+
+    def posicion_celda(self, cell):
+        """(RowIndex, ColumnIndex) de una celda, base 1"""
+        return cell.get('RowIndex', 0), cell.get('ColumnIndex', 0)
+
+    def texto_lineas(self):
+        return [block.get('Text', '') for block in self.lineas]
+
+    def formularios(self):
+        """Pares clave -> valor de los KEY_VALUE_SET"""
+        forms = {}
+        for key_block in self.claves:
+            key_text = self.texto(key_block)
+            if key_text and key_text.strip():
+                forms[key_text] = self.valor_de_clave(key_block)
+        return forms
@@ -0,0 +1,227 @@
+# utils/textract_poller.py
+import json
+import queue
+from abc import ABC, abstractmethod
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.aws_resiliencia import CircuitoAbiertoError, es_throttling
+
+ESTADOS_FINALES = ('SUCCEEDED', 'FAILED', 'PARTIAL_SUCCESS')
+
+
+class FuenteNotificaciones(ABC):
+    """Origen de avisos de finalización de jobs (SNS/SQS, cola local, etc.)"""
+
+    @abstractmethod
+    def recibir(self, timeout, seguido=None):
+        """Devuelve una lista de (job_id, estado) esperando como máximo `timeout` segundos.
+
+        `seguido(job_id)` indica si el job es de este proceso; los avisos de otros
+        jobs no se consumen para que los reciba quien los sigue.
+        """
+
+
+class ColaNotificacionesLocal(FuenteNotificaciones):
+    """Cola en memoria que simula el canal SNS -> SQS de Textract"""
+
+    def __init__(self):
+        self._cola = queue.Queue()
+
+    def publicar(self, job_id, estado='SUCCEEDED'):
+        self._cola.put((job_id, estado))
+
+    def recibir(self, timeout, seguido=None):
+        avisos = []
+        try:
+            avisos.append(self._cola.get(timeout=max(0.0, timeout)))
+            while True:
+                avisos.append(self._cola.get_nowait())
+        except queue.Empty:
+            pass
+        # Como en SQS: solo se entregan los avisos de jobs que este proceso sigue
+        return [aviso for aviso in avisos if seguido is None or seguido(aviso[0])]
+
+
+class ColaNotificacionesSQS(FuenteNotificaciones):
+    """Lee los avisos que Textract publica en SNS y llegan a una cola SQS"""
+
+    def __init__(self, sqs_client, queue_url):
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+
+    def recibir(self, timeout, seguido=None):
+        # Long polling: SQS responde apenas llega un mensaje, o vacío tras el timeout
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=int(min(20, max(1, timeout)))
+        )
+        avisos = []
+        for mensaje in response.get('Messages', []):
+            try:
+                cuerpo = json.loads(mensaje['Body'])
+                # Mensaje SNS envuelto: el aviso de Textract viene en 'Message'
+                aviso = json.loads(cuerpo['Message']) if 'Message' in cuerpo else cuerpo
+                job_id, estado = aviso['JobId'], aviso['Status']
+            except (KeyError, ValueError):
+                continue
+            if seguido is not None and not seguido(job_id):
+                # Job de otro worker: el mensaje vuelve a la cola al vencer su visibilidad
+                continue
+            avisos.append((job_id, estado))
+            self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=mensaje['ReceiptHandle'])
+        return avisos
+
+
+class _JobSeguido:
+    def __init__(self, job_id, paginas, primer_intervalo, consultar=None):
+        self.job_id = job_id
+        self.paginas = paginas
+        self.consultar = consultar
+        self.future = Future()
+        self.inicio = time.monotonic()
+        self.intervalo = primer_intervalo
+        self.proximo = self.inicio + primer_intervalo
+        self.consultas = 0
+        self.errores = 0
+
+
+class PollerTextract:
+    """Sigue todos los JobIds pendientes desde un único hilo con backoff adaptativo.
+
+    El primer intervalo crece con las páginas estimadas del documento y cada
+    consulta sin resultado lo multiplica por `factor` (con jitter), hasta
+    `intervalo_max`. Si hay fuente de notificaciones, un segundo hilo la escucha
+    con long polling y cada aviso adelanta la consulta del job.
+    """
+
+    def __init__(self, obtener_estado, fuente=None, intervalo_min=1.0, intervalo_max=30.0,
+                 factor=1.6, segundos_por_pagina=0.5, max_errores=5, espera_avisos=20.0):
+        self.obtener_estado = obtener_estado
+        self.fuente = fuente
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.factor = factor
+        self.segundos_por_pagina = segundos_por_pagina
+        self.max_errores = max_errores
+        self.espera_avisos = espera_avisos
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._hilo = None
+        self._hilo_avisos = None
+        self.estadisticas = {'jobs': 0, 'consultas': 0, 'avisos': 0}
+
+    def registrar(self, job_id, paginas_estimadas=1, consultar=None):
+        """Empieza a seguir un job y devuelve un Future con la primera respuesta final.
+
+        `consultar(job_id)` reemplaza a `obtener_estado` para este job (p. ej. jobs
+        de detección de texto, que se consultan con otra operación).
+        """
+        with self._cond:
+            if job_id in self._jobs:
+                return self._jobs[job_id].future
+            primer_intervalo = min(
+                self.intervalo_max,
+                self.intervalo_min + self.segundos_por_pagina * max(1, paginas_estimadas)
+            )
+            job = _JobSeguido(job_id, paginas_estimadas, primer_intervalo, consultar)
+            self._jobs[job_id] = job
+            self.estadisticas['jobs'] += 1
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="textract-poller", daemon=True)
+                self._hilo.start()
+            if self.fuente is not None and self._hilo_avisos is None:
+                self._hilo_avisos = threading.Thread(target=self._bucle_avisos, name="textract-avisos", daemon=True)
+                self._hilo_avisos.start()
+            self._cond.notify()
+            return job.future
+
+    def esperar(self, job_id, paginas_estimadas=1, timeout=None, consultar=None):
+        """Bloquea hasta que el job termina y devuelve su primera respuesta"""
+        return self.registrar(job_id, paginas_estimadas, consultar).result(timeout=timeout)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                if not self._jobs:
+                    self._hilo = None
+                    return
+                espera = max(0.0, min(job.proximo for job in self._jobs.values()) - time.monotonic())
+                # Un registro nuevo o un aviso despiertan el bucle antes de tiempo
+                self._cond.wait(espera)
+                ahora = time.monotonic()
+                vencidos = [job for job in self._jobs.values() if job.proximo <= ahora]
+            for job in vencidos:
+                self._consultar(job)
+
+    def _bucle_avisos(self):
+        while True:
+            with self._cond:
+                if not self._jobs:
+                    self._hilo_avisos = None
+                    return
+            self._aplicar_avisos(self._recibir_avisos(self.espera_avisos))
+
+    def _seguido(self, job_id):
+        with self._cond:
+            return job_id in self._jobs
+
+    def _recibir_avisos(self, timeout):
+        try:
+            return self.fuente.recibir(timeout, self._seguido)
+        except Exception:
+            time.sleep(min(timeout, self.intervalo_min))
+            return []
+
+    def _aplicar_avisos(self, avisos):
+        ahora = time.monotonic()
+        with self._cond:
+            for job_id, estado in avisos:
+                job = self._jobs.get(job_id)
+                if job and estado in ESTADOS_FINALES:
+                    self.estadisticas['avisos'] += 1
+                    job.proximo = ahora
+            if avisos:
+                self._cond.notify()
+
+    def _consultar(self, job):
+        try:
+            response = (job.consultar or self.obtener_estado)(job.job_id)
+        except CircuitoAbiertoError:
+            # Textract degradado: se vuelve a consultar más tarde sin gastar el presupuesto
+            # de errores, para no abandonar un job que quizá ya terminó (y se cobró)
+            self._reprogramar(job)
+            return
+        except Exception as e:
+            if es_throttling(e):
+                self._reprogramar(job)
+                return
+            job.errores += 1
+            if job.errores >= self.max_errores:
+                self._terminar(job, error=e)
+            else:
+                self._reprogramar(job)
+            return
+
+        job.consultas += 1
+        self.estadisticas['consultas'] += 1
+        if response.get('JobStatus') in ESTADOS_FINALES:
+            self._terminar(job, response=response)
+        else:
+            self._reprogramar(job)
+
+    def _reprogramar(self, job):
+        job.intervalo = min(self.intervalo_max, job.intervalo * self.factor)
+        # Jitter "igualado": entre la mitad y el total del intervalo
+        job.proximo = time.monotonic() + job.intervalo * random.uniform(0.5, 1.0)
+
+    def _terminar(self, job, response=None, error=None):
+        with self._cond:
+            self._jobs.pop(job.job_id, None)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(response)
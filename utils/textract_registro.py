@@ -0,0 +1,90 @@
+# utils/textract_registro.py
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Textract conserva los resultados de jobs asíncronos 7 días; se deja margen
+RETENCION_SEGUNDOS = 7 * 24 * 3600 - 3600
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    clave TEXT PRIMARY KEY,
+    s3_key TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    solo_texto INTEGER NOT NULL DEFAULT 0,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+)
+"""
+
+
+class RegistroJobs:
+    """Registro persistente (SQLite) de jobs asíncronos de Textract por hash de archivo.
+
+    Permite volver a engancharse a un job en curso o ya terminado después de un
+    rerun de Streamlit o un reinicio del servidor, en lugar de volver a subir el
+    archivo y pagar un análisis nuevo.
+    """
+
+    def __init__(self, ruta, retencion_segundos=RETENCION_SEGUNDOS):
+        self.ruta = ruta
+        self.retencion_segundos = retencion_segundos
+        self._lock = threading.Lock()
+        with self._conectar() as conn:
+            conn.execute(_ESQUEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id)")
+        self.purgar()
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión corta por operación: confirma al salir y siempre se cierra"""
+        conn = sqlite3.connect(self.ruta, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def buscar(self, clave):
+        """Job reutilizable para la clave (dict) o None si no hay, falló o expiró"""
+        limite = time.time() - self.retencion_segundos
+        with self._lock, self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT s3_key, job_id, estado, solo_texto, creado, actualizado FROM jobs "
+                "WHERE clave = ? AND creado > ? AND estado != 'FAILED'",
+                (clave, limite)
+            ).fetchone()
+        if fila is None:
+            return None
+        return {
+            's3_key': fila[0],
+            'job_id': fila[1],
+            'estado': fila[2],
+            'solo_texto': bool(fila[3]),
+            'creado': fila[4],
+            'actualizado': fila[5]
+        }
+
+    def registrar(self, clave, s3_key, job_id, solo_texto=False, estado='IN_PROGRESS'):
+        ahora = time.time()
+        with self._lock, self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (clave, s3_key, job_id, estado, solo_texto, creado, actualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave, s3_key, job_id, estado, int(solo_texto), ahora, ahora)
+            )
+
+    def actualizar_estado(self, job_id, estado):
+        with self._lock, self._conectar() as conn:
+            conn.execute(
+                "UPDATE jobs SET estado = ?, actualizado = ? WHERE job_id = ?",
+                (estado, time.time(), job_id)
+            )
+
+    def purgar(self):
+        """Elimina entradas cuyos resultados ya no existen en Textract"""
+        limite = time.time() - self.retencion_segundos
+        with self._lock, self._conectar() as conn:
+            return conn.execute("DELETE FROM jobs WHERE creado <= ?", (limite,)).rowcount
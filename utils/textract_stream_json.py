@@ -0,0 +1,169 @@
+# utils/textract_stream_json.py
+import codecs
+import json
+import threading
+
+from botocore.exceptions import ClientError
+
+from utils.aws_clients import AWS_CONNECT_TIMEOUT, AWS_MAX_POOL_CONNECTIONS, AWS_READ_TIMEOUT, obtener_cliente, obtener_session
+
+TAMANO_LECTURA = 64 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+_decodificador = json.JSONDecoder()
+_ESPACIOS = ' \t\n\r'
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import urllib3
+
+            _pool = urllib3.PoolManager(
+                maxsize=AWS_MAX_POOL_CONNECTIONS,
+                timeout=urllib3.Timeout(connect=AWS_CONNECT_TIMEOUT, read=AWS_READ_TIMEOUT),
+                retries=False
+            )
+        return _pool
+
+
+def abrir_respuesta_textract(operacion, payload):
+    """POST firmado (SigV4) a la API JSON de Textract; devuelve la respuesta sin leer.
+
+    Equivale a `textract.<operacion>(**payload)` pero deja el cuerpo como stream
+    para decodificarlo por partes. Los errores HTTP se convierten en ClientError
+    para que aws_resiliencia los reintente igual que los de boto3.
+    """
+    from botocore.auth import SigV4Auth
+    from botocore.awsrequest import AWSRequest
+
+    cliente = obtener_cliente('textract')
+    session = obtener_session()
+    credenciales = session.get_credentials().get_frozen_credentials()
+    request = AWSRequest(
+        method='POST',
+        url=cliente.meta.endpoint_url + '/',
+        data=json.dumps(payload).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/x-amz-json-1.1',
+            'X-Amz-Target': f'Textract.{operacion}',
+        }
+    )
+    SigV4Auth(credenciales, 'textract', cliente.meta.region_name).add_auth(request)
+
+    respuesta = _obtener_pool().request(
+        'POST', request.url, body=request.body, headers=dict(request.headers), preload_content=False
+    )
+    if respuesta.status != 200:
+        cuerpo = respuesta.read()
+        respuesta.release_conn()
+        try:
+            error = json.loads(cuerpo)
+        except ValueError:
+            error = {}
+        codigo = (error.get('__type') or f'HTTP{respuesta.status}').split('#')[-1]
+        mensaje = error.get('message') or error.get('Message') or cuerpo[:200].decode('utf-8', 'replace')
+        raise ClientError(
+            {'Error': {'Code': codigo, 'Message': mensaje},
+             'ResponseMetadata': {'HTTPStatusCode': respuesta.status}},
+            operacion
+        )
+    return respuesta
+
+
+class LectorRespuestaTextract:
+    """Decodifica una respuesta JSON de Textract a medida que llega por la red.
+
+    `bloques()` genera cada elemento de "Blocks" en cuanto se completa su JSON;
+    en memoria solo están el bloque en curso y un trozo de lectura. El resto de
+    campos de primer nivel (JobStatus, NextToken, DocumentMetadata...) quedan en
+    `metadatos` al agotar el generador.
+    """
+
+    def __init__(self, stream, tamano_lectura=TAMANO_LECTURA):
+        self.stream = stream
+        self.tamano_lectura = tamano_lectura
+        self.metadatos = {}
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._fin = False
+
+    def _leer(self):
+        """Agrega un trozo al buffer; False si el stream terminó"""
+        if self._fin:
+            return False
+        datos = self.stream.read(self.tamano_lectura)
+        if not datos:
+            self._fin = True
+            self._buffer += self._utf8.decode(b'', final=True)
+            return False
+        # Descartar lo ya consumido para que el buffer no crezca
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(datos)
+        self._pos = 0
+        return True
+
+    def _siguiente_caracter(self):
+        """Salta espacios y devuelve el siguiente carácter significativo sin consumirlo"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _ESPACIOS:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._leer():
+                raise ValueError("Respuesta JSON de Textract truncada")
+
+    def _esperar(self, caracter):
+        if self._siguiente_caracter() != caracter:
+            raise ValueError(f"JSON inesperado: se esperaba {caracter!r} en la respuesta de Textract")
+        self._pos += 1
+
+    def _valor(self):
+        """Decodifica el siguiente valor JSON completo, leyendo más si hace falta"""
+        self._siguiente_caracter()
+        while True:
+            try:
+                valor, fin = _decodificador.raw_decode(self._buffer, self._pos)
+                # Un valor que toca el final del buffer puede estar cortado (p. ej. un número)
+                if fin < len(self._buffer) or self._fin:
+                    self._pos = fin
+                    return valor
+            except json.JSONDecodeError:
+                if self._fin:
+                    raise
+            self._leer()
+
+    def bloques(self):
+        self._esperar('{')
+        if self._siguiente_caracter() == '}':
+            self._pos += 1
+            return
+        while True:
+            clave = self._valor()
+            self._esperar(':')
+            if clave == 'Blocks':
+                yield from self._elementos_lista()
+            else:
+                self.metadatos[clave] = self._valor()
+            separador = self._siguiente_caracter()
+            self._pos += 1
+            if separador == '}':
+                return
+            if separador != ',':
+                raise ValueError("JSON inesperado en la respuesta de Textract")
+
+    def _elementos_lista(self):
+        self._esperar('[')
+        if self._siguiente_caracter() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._valor()
+            separador = self._siguiente_caracter()
+            self._pos += 1
+            if separador == ']':
+                return
+            if separador != ',':
+                raise ValueError("JSON inesperado en la lista Blocks de Textract")
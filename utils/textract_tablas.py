@@ -0,0 +1,77 @@
+# utils/textract_tablas.py
+
+
+class TablaTextract:
+    """Tabla detectada por Textract guardada como celdas (fila, columna, texto).
+
+    Solo conserva las celdas con texto. Filas y columnas útiles (las que no
+    quedan vacías) se conocen sin construir nada; el DataFrame limpio se arma
+    en el primer acceso a `dataframe` y queda memoizado. Las etiquetas de índice
+    y columnas son las posiciones originales (base 0), igual que el DataFrame
+    que se obtenía antes con replace/dropna/fillna.
+    """
+
+    __slots__ = ('celdas', 'filas_usadas', 'columnas_usadas', '_dataframe')
+
+    def __init__(self, celdas):
+        self.celdas = [(fila, columna, texto) for fila, columna, texto in celdas if texto != '']
+        self.filas_usadas = sorted({fila for fila, _, _ in self.celdas})
+        self.columnas_usadas = sorted({columna for _, columna, _ in self.celdas})
+        self._dataframe = None
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Compatibilidad con resultados y entradas de caché que guardaban DataFrames"""
+        import pandas as pd
+
+        celdas = []
+        for fila, valores in zip(df.index, df.itertuples(index=False, name=None)):
+            for columna, valor in zip(df.columns, valores):
+                if not pd.isna(valor):
+                    celdas.append((fila, columna, str(valor)))
+        return cls(celdas)
+
+    @property
+    def filas(self):
+        return len(self.filas_usadas)
+
+    @property
+    def columnas(self):
+        return len(self.columnas_usadas)
+
+    @property
+    def shape(self):
+        return self.filas, self.columnas
+
+    @property
+    def empty(self):
+        return not self.celdas
+
+    def __len__(self):
+        return self.filas
+
+    @property
+    def dataframe(self):
+        """DataFrame limpio (sin filas ni columnas vacías), construido una sola vez"""
+        if self._dataframe is None:
+            import pandas as pd
+
+            pos_fila = {fila: i for i, fila in enumerate(self.filas_usadas)}
+            pos_columna = {columna: j for j, columna in enumerate(self.columnas_usadas)}
+            matriz = [[''] * len(pos_columna) for _ in pos_fila]
+            for fila, columna, texto in self.celdas:
+                matriz[pos_fila[fila]][pos_columna[columna]] = texto
+            self._dataframe = pd.DataFrame(matriz, index=self.filas_usadas, columns=self.columnas_usadas)
+        return self._dataframe
+
+    def a_json(self):
+        return {'celdas': [list(celda) for celda in self.celdas]}
+
+    @classmethod
+    def desde_json(cls, data):
+        return cls(tuple(celda) for celda in data['celdas'])
+
+
+def como_tabla(tabla):
+    """Convierte DataFrames heredados en TablaTextract; deja pasar las TablaTextract"""
+    return tabla if isinstance(tabla, TablaTextract) else TablaTextract.desde_dataframe(tabla)
@@ -1,281 +1,847 @@
-import boto3
 import os
 import time
-from trp import Document
-import pandas as pd
-from botocore.exceptions import ClientError
-import json
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utils.aws_clients import obtener_cliente
+from utils.aws_resiliencia import llamar_aws
+from utils.imagen_utils import IMAGEN_PREPROCESO_WORKERS, LIMITE_BYTES_SINCRONO, es_imagen, preprocesar_imagen
+from utils.pdf_utils import (abrir_lector, dividir_en_paginas, construir_pdf,
+                             extraer_capa_texto, planificar_paginas, texto_primera_pagina)
+from utils.pipeline import Etapa, PipelineEtapas, MAX_EN_VUELO_DEFAULT, poner_o_detener
+from utils.planificador_lotes import PlanificadorSJF, estimar_costo, resumen_tiempos
+from utils.planificador_textract import planificar_features
+from utils.textract_cache import CacheTextract, clave_contenido, clave_contenido_archivo
+from utils.textract_columnar import BloquesColumnares
+from utils.textract_grafo import GrafoBloques
+from utils.textract_poller import PollerTextract, ColaNotificacionesSQS
+from utils.textract_registro import RegistroJobs
+from utils.textract_stream_json import LectorRespuestaTextract, abrir_respuesta_textract
+from utils.textract_tablas import TablaTextract, como_tabla
 
-# Configurar session correctamente
-session = boto3.Session(
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
+S3_BUCKET = os.getenv("BUCKET_NAME")
 
-s3 = session.client('s3')
-textract = session.client('textract')
+# Canal opcional de notificaciones de fin de job (SNS -> SQS)
+TEXTRACT_SNS_TOPIC_ARN = os.getenv("TEXTRACT_SNS_TOPIC_ARN")
+TEXTRACT_SNS_ROLE_ARN = os.getenv("TEXTRACT_SNS_ROLE_ARN")
+TEXTRACT_SQS_QUEUE_URL = os.getenv("TEXTRACT_SQS_QUEUE_URL")
 
-S3_BUCKET = os.getenv("BUCKET_NAME")
+# Caché local de resultados (TEXTRACT_CACHE_MAX_MB=0 la desactiva)
+TEXTRACT_CACHE_DIR = os.getenv("TEXTRACT_CACHE_DIR", ".textract_cache")
+TEXTRACT_CACHE_MAX_MB = int(os.getenv("TEXTRACT_CACHE_MAX_MB", "512"))
+
+# Registro SQLite de jobs asíncronos para reengancharse tras reruns/reinicios ("" lo desactiva)
+TEXTRACT_REGISTRO_DB = os.getenv("TEXTRACT_REGISTRO_DB", ".textract_jobs.sqlite3")
+
+FEATURE_TYPES_DEFAULT = ['TABLES', 'FORMS']
+
+# Fan-out síncrono de PDFs pequeños (analyze_document por página)
+FANOUT_MAX_PAGINAS = int(os.getenv("FANOUT_MAX_PAGINAS", "10"))
+FANOUT_CONCURRENCIA = int(os.getenv("FANOUT_CONCURRENCIA", "4"))
+
+# Pre-paso de capa de texto para PDFs nativos (0 lo desactiva)
+TEXTO_NATIVO_HABILITADO = os.getenv("TEXTO_NATIVO_HABILITADO", "1") == "1"
+
+# Conservar los bloques de cada página en el resultado, en formato columnar (opt-in)
+TEXTRACT_CONSERVAR_BLOQUES = os.getenv("TEXTRACT_CONSERVAR_BLOQUES", "0") == "1"
+
+# Descargar los resultados de jobs asíncronos decodificando el JSON en streaming (opt-in)
+TEXTRACT_STREAMING_JSON = os.getenv("TEXTRACT_STREAMING_JSON", "0") == "1"
+
+# Orden shortest-job-first de los lotes (0 = orden de llegada)
+SJF_HABILITADO = os.getenv("SJF_HABILITADO", "1") == "1"
+
+# Subida multipart: tamaño de parte y partes en paralelo por archivo
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "8"))
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+
+_poller = None
+_poller_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+_registro = None
+_registro_lock = threading.Lock()
 
 def upload_bytes_to_s3(bytes_data, key):
     """Sube bytes directamente a S3"""
     try:
-        s3.put_object(Bucket=S3_BUCKET, Key=key, Body=bytes_data)
+        # S3 conserva los reintentos de botocore (como las partes de upload_fileobj)
+        obtener_cliente('s3').put_object(Bucket=S3_BUCKET, Key=key, Body=bytes_data)
         return f"s3://{S3_BUCKET}/{key}"
     except Exception as e:
         raise Exception(f"Error subiendo a S3: {str(e)}")
 
-def start_textract_analysis(bucket, key):
-    """Inicia análisis de Textract para PDF"""
+def upload_fileobj_to_s3(fileobj, key, part_size_mb=None, concurrency=None, progreso=None):
+    """Sube un archivo a S3 en streaming, con partes multipart en paralelo.
+    
+    Cada parte es una petición UploadPart independiente, por lo que los reintentos
+    de botocore se aplican parte por parte. `progreso(bytes_transferidos, total)` se
+    invoca a medida que avanzan las partes. Devuelve (s3_uri, métricas de la subida).
+    """
+    from boto3.s3.transfer import TransferConfig
+    
+    part_size = (part_size_mb or S3_PART_SIZE_MB) * 1024 * 1024
+    config = TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=concurrency or S3_UPLOAD_CONCURRENCY
+    )
+    total = _tamano_archivo(fileobj)
+    transferidos = 0
+    lock = threading.Lock()
+    
+    def callback(bytes_parte):
+        nonlocal transferidos
+        with lock:
+            transferidos += bytes_parte
+            actual = transferidos
+        if progreso:
+            progreso(actual, total)
+    
+    inicio = time.perf_counter()
     try:
-        response = textract.start_document_analysis(
-            DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
-            FeatureTypes=['TABLES', 'FORMS']
-        )
+        obtener_cliente('s3').upload_fileobj(fileobj, S3_BUCKET, key, Config=config, Callback=callback)
+    except Exception as e:
+        raise Exception(f"Error subiendo a S3: {str(e)}")
+    segundos = time.perf_counter() - inicio
+    
+    metricas = {
+        'bytes': total,
+        'partes': max(1, -(-total // part_size)),
+        'segundos': round(segundos, 3),
+        'mb_por_segundo': round(total / (1024 * 1024) / segundos, 2) if segundos > 0 else 0.0
+    }
+    return f"s3://{S3_BUCKET}/{key}", metricas
+
+def _tamano_archivo(fileobj):
+    """Tamaño en bytes de un archivo abierto sin leerlo"""
+    posicion = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    tamano = fileobj.tell() - posicion
+    fileobj.seek(posicion)
+    return tamano
+
+def start_textract_analysis(bucket, key, feature_types=None):
+    """Inicia análisis de Textract para PDF (feature_types=[] -> solo detección de texto)"""
+    if feature_types is None:
+        feature_types = FEATURE_TYPES_DEFAULT
+    try:
+        params = {'DocumentLocation': {'S3Object': {'Bucket': bucket, 'Name': key}}}
+        if feature_types:
+            params['FeatureTypes'] = feature_types
+        if TEXTRACT_SNS_TOPIC_ARN and TEXTRACT_SNS_ROLE_ARN:
+            # Textract avisa por SNS al terminar; el poller lo recibe vía SQS
+            params['NotificationChannel'] = {
+                'SNSTopicArn': TEXTRACT_SNS_TOPIC_ARN,
+                'RoleArn': TEXTRACT_SNS_ROLE_ARN
+            }
+        if feature_types:
+            response = llamar_aws('textract', obtener_cliente('textract').start_document_analysis, **params)
+        else:
+            response = llamar_aws('textract', obtener_cliente('textract').start_document_text_detection, **params)
         return response['JobId']
     except Exception as e:
         raise Exception(f"Error iniciando análisis Textract: {str(e)}")
 
-def wait_for_textract_job(job_id, delay=5):
-    """Espera a que el job de Textract termine"""
+def obtener_poller():
+    """Poller compartido que sigue todos los jobs asíncronos en un solo hilo"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            fuente = None
+            if TEXTRACT_SQS_QUEUE_URL:
+                fuente = ColaNotificacionesSQS(obtener_cliente('sqs'), TEXTRACT_SQS_QUEUE_URL)
+            _poller = PollerTextract(obtener_resultados_job, fuente=fuente)
+        return _poller
+
+def obtener_cache():
+    """Caché compartida de resultados Textract, o None si está desactivada"""
+    global _cache
+    if TEXTRACT_CACHE_MAX_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheTextract(TEXTRACT_CACHE_DIR, TEXTRACT_CACHE_MAX_MB * 1024 * 1024)
+        return _cache
+
+def obtener_resultados_job(job_id, solo_texto=False, **kwargs):
+    """get_document_analysis o get_document_text_detection según el tipo de job"""
+    if solo_texto:
+        return llamar_aws('textract', obtener_cliente('textract').get_document_text_detection, JobId=job_id, **kwargs)
+    return llamar_aws('textract', obtener_cliente('textract').get_document_analysis, JobId=job_id, **kwargs)
+
+def obtener_registro():
+    """Registro persistente de jobs asíncronos, o None si está desactivado"""
+    global _registro
+    if not TEXTRACT_REGISTRO_DB:
+        return None
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroJobs(TEXTRACT_REGISTRO_DB)
+        return _registro
+
+def wait_for_textract_job(job_id, paginas_estimadas=1, timeout=None, solo_texto=False):
+    """Espera a que el job de Textract termine (sin ocupar un hilo de sondeo por job)"""
+    consultar = partial(obtener_resultados_job, solo_texto=True) if solo_texto else None
+    return obtener_poller().esperar(job_id, paginas_estimadas, timeout, consultar)
+
+def iterar_respuestas_textract(job_id, primera_respuesta=None, prefetch=1, solo_texto=False):
+    """Genera cada página de respuesta del job siguiendo NextToken.
+    
+    Un hilo descarga la página siguiente mientras el consumidor procesa la actual;
+    como máximo hay `prefetch` páginas esperando en memoria. Si el consumidor deja
+    de iterar, el hilo termina la descarga en curso y sale.
+    """
+    cola = queue.Queue(maxsize=max(1, prefetch))
+    detener = threading.Event()
+    
+    def descargar():
+        try:
+            response = primera_respuesta or obtener_resultados_job(job_id, solo_texto)
+            while poner_o_detener(cola, response, detener):
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+                response = obtener_resultados_job(job_id, solo_texto, NextToken=next_token)
+        except Exception as e:
+            poner_o_detener(cola, e, detener)
+        poner_o_detener(cola, None, detener)
+    
+    threading.Thread(target=descargar, name=f"textract-paginas-{job_id[:8]}", daemon=True).start()
+    
+    try:
+        while True:
+            response = cola.get()
+            if response is None:
+                return
+            if isinstance(response, Exception):
+                raise Exception(f"Error obteniendo resultados Textract: {str(response)}")
+            yield response
+    finally:
+        detener.set()
+
+def iterar_lotes_bloques(job_id, primera_respuesta=None, prefetch=1, solo_texto=False):
+    """Genera los bloques de cada página de respuesta de un job asíncrono"""
+    for response in iterar_respuestas_textract(job_id, primera_respuesta, prefetch, solo_texto):
+        yield response.get('Blocks', [])
+
+def iterar_lotes_bloques_streaming(job_id, primera_respuesta=None, solo_texto=False):
+    """Como iterar_lotes_bloques, pero cada lote es un generador que decodifica el
+    JSON de la respuesta a medida que llega, sin materializar la lista de bloques.
+    
+    Pensado para documentos largos: junto con parse_textract_stream la memoria queda
+    acotada por una página del documento, no por el tamaño de la respuesta.
+    """
+    operacion = 'GetDocumentTextDetection' if solo_texto else 'GetDocumentAnalysis'
+    next_token = None
+    if primera_respuesta is not None:
+        # La primera página ya la trajo el poller
+        yield primera_respuesta.get('Blocks', [])
+        next_token = primera_respuesta.get('NextToken')
+        if not next_token:
+            return
+    
     while True:
-        response = textract.get_document_analysis(JobId=job_id)
-        status = response['JobStatus']
-        
-        if status in ['SUCCEEDED', 'FAILED']:
-            return response
-            
-        time.sleep(delay)
+        payload = {'JobId': job_id}
+        if next_token:
+            payload['NextToken'] = next_token
+        respuesta = llamar_aws('textract', abrir_respuesta_textract, operacion, payload)
+        completa = False
+        try:
+            lector = LectorRespuestaTextract(respuesta)
+            bloques = lector.bloques()
+            yield bloques
+            # Terminar de leer lo que el consumidor no pidió para conocer NextToken
+            for _ in bloques:
+                pass
+            completa = True
+        finally:
+            if completa:
+                # Solo pueden quedar espacios tras el JSON: la conexión vuelve limpia al pool
+                respuesta.drain_conn()
+            else:
+                # Cuerpo a medio leer (el consumidor paró o hubo un error): no reutilizar
+                respuesta.close()
+            respuesta.release_conn()
+        next_token = lector.metadatos.get('NextToken')
+        if not next_token:
+            return
 
 def detect_document_text(bytes_data):
     """Detección sincrónica para imágenes - SOLO TEXTO (para compatibilidad)"""
     try:
-        response = textract.detect_document_text(
+        response = llamar_aws(
+            'textract', obtener_cliente('textract').detect_document_text,
             Document={'Bytes': bytes_data}
         )
         return response
     except Exception as e:
         raise Exception(f"Error en detect_document_text: {str(e)}")
 
-def analyze_document_with_tables(bytes_data):
-    """Análisis sincrónico para imágenes CON SOPORTE DE TABLAS"""
+def analyze_document_with_tables(bytes_data, feature_types=None):
+    """Análisis sincrónico para imágenes CON SOPORTE DE TABLAS (feature_types=[] -> solo texto)"""
+    if feature_types is None:
+        feature_types = FEATURE_TYPES_DEFAULT
+    if not feature_types:
+        return detect_document_text(bytes_data)
     try:
-        response = textract.analyze_document(
+        response = llamar_aws(
+            'textract', obtener_cliente('textract').analyze_document,
             Document={'Bytes': bytes_data},
-            FeatureTypes=['TABLES', 'FORMS']
+            FeatureTypes=feature_types
         )
         return response
     except Exception as e:
         raise Exception(f"Error en analyze_document: {str(e)}")
 
+def elegir_ruta_pdf(paginas, tamano):
+    """Decide entre fan-out síncrono por página ('paginas') y job asíncrono ('asincrona').
+    
+    Con pocas páginas, N llamadas analyze_document concurrentes terminan en unos
+    segundos, mientras que un job asíncrono rara vez baja de la decena de segundos
+    entre cola y sondeo. Los PDFs largos (o ilegibles) van al job asíncrono.
+    """
+    if 0 < paginas <= FANOUT_MAX_PAGINAS and tamano <= paginas * LIMITE_BYTES_SINCRONO:
+        return "paginas"
+    return "asincrona"
+
+def combinar_respuestas_paginas(respuestas):
+    """Une respuestas de una página cada una en una sola, corrigiendo el número de Page"""
+    blocks = []
+    for numero, response in enumerate(respuestas, start=1):
+        for block in response.get('Blocks', []):
+            block['Page'] = numero
+            blocks.append(block)
+    return {
+        'DocumentMetadata': {'Pages': len(respuestas)},
+        'Blocks': blocks
+    }
+
+def analizar_pdf_por_paginas(paginas_pdf, concurrencia=None, feature_types=None):
+    """Analiza cada página (PDF de una página) con analyze_document en paralelo"""
+    analizar = partial(analyze_document_with_tables, feature_types=feature_types)
+    with ThreadPoolExecutor(max_workers=concurrencia or FANOUT_CONCURRENCIA) as executor:
+        respuestas = list(executor.map(analizar, paginas_pdf))
+    return combinar_respuestas_paginas(respuestas)
+
+def _como_grafo(blocks):
+    """Acepta una lista de bloques o un GrafoBloques/BloquesColumnares ya construido"""
+    return blocks if isinstance(blocks, (GrafoBloques, BloquesColumnares)) else GrafoBloques(blocks)
+
 def parse_textract_blocks(blocks):
-    """Parsea los bloques de Textract a texto estructurado - MEJORADO"""
-    text_lines = []
+    """Parsea los bloques de Textract a texto estructurado - una pasada sobre el grafo indexado"""
+    grafo = _como_grafo(blocks)
     tables = []
-    forms = {}
+    errores = 0
     
-    # Primero procesar todos los bloques básicos
-    for block in blocks:
-        block_type = block['BlockType']
-        
-        if block_type == 'LINE':
-            text_lines.append(block.get('Text', ''))
-        
-        elif block_type == 'KEY_VALUE_SET':
-            # Procesar formularios
-            if 'KEY' in block.get('EntityTypes', []):
-                key_text = get_text_from_block(block, blocks)
-                value_text = find_value_for_key(block, blocks)
-                if key_text and key_text.strip():
-                    forms[key_text] = value_text
-    
-    # Luego procesar tablas (necesitan todos los bloques disponibles)
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            table_data = process_table_block(block, blocks)
-            # Solo agregar tablas que tengan contenido
-            if not table_data.empty and table_data.shape[0] > 0 and table_data.shape[1] > 0:
-                tables.append(table_data)
+    for table_block in grafo.tablas:
+        try:
+            tabla = construir_tabla(table_block, grafo)
+        except Exception as e:
+            print(f"Error procesando tabla: {e}")
+            errores += 1
+            continue
+        # Solo agregar tablas que tengan contenido
+        if not tabla.empty:
+            tables.append(tabla)
     
     return {
-        'text': '\n'.join(text_lines),
+        'text': '\n'.join(grafo.texto_lineas()),
+        'tables': tables,
+        'forms': grafo.formularios(),
+        'errores': errores
+    }
+
+def parse_textract_stream(lotes, conservar_bloques=False):
+    """Parsea lotes de bloques a medida que llegan, agrupados por página del documento.
+    
+    Cada página se parsea en cuanto aparecen bloques de la siguiente, así que en
+    memoria solo conviven la página en curso y el lote recibido. Con
+    `conservar_bloques` cada página se guarda como BloquesColumnares en 'bloques'.
+    """
+    text_parts = []
+    tables = []
+    forms = {}
+    pages = 0
+    errores = 0
+    pendientes = {}
+    textos_pagina = {}
+    bloques = []
+    
+    def volcar(pagina):
+        nonlocal pages, errores
+        if conservar_bloques:
+            grafo = BloquesColumnares(pendientes.pop(pagina))
+            bloques.append(grafo)
+        else:
+            grafo = GrafoBloques(pendientes.pop(pagina))
+        parsed = parse_textract_blocks(grafo)
+        if conservar_bloques:
+            # El memo solo sirve durante el parseo: no se guarda con los bloques
+            grafo.liberar_memo()
+        if parsed['text']:
+            text_parts.append(parsed['text'])
+            textos_pagina[pagina] = parsed['text']
+        tables.extend(parsed['tables'])
+        forms.update(parsed['forms'])
+        errores += parsed['errores']
+        pages += len(grafo.paginas)
+    
+    for lote in lotes:
+        for block in lote:
+            pagina = block.get('Page', 1)
+            pendientes.setdefault(pagina, []).append(block)
+            # Textract entrega los bloques ordenados por página
+            for anterior in [p for p in pendientes if p < pagina]:
+                volcar(anterior)
+    
+    for pagina in sorted(pendientes):
+        volcar(pagina)
+    
+    parsed = {
+        'text': '\n'.join(text_parts),
         'tables': tables,
-        'forms': forms
+        'forms': forms,
+        'pages': pages,
+        'textos_pagina': textos_pagina,
+        'errores': errores
     }
+    if conservar_bloques:
+        parsed['bloques'] = bloques
+    return parsed
 
 def find_value_for_key(key_block, blocks):
     """Encuentra el valor correspondiente para un bloque key"""
     try:
-        if 'Relationships' in key_block:
-            for relationship in key_block['Relationships']:
-                if relationship['Type'] == 'VALUE':
-                    for value_id in relationship['Ids']:
-                        value_block = next((b for b in blocks if b['Id'] == value_id), None)
-                        if value_block:
-                            return get_text_from_block(value_block, blocks)
+        return _como_grafo(blocks).valor_de_clave(key_block)
     except Exception:
-        pass
-    return ""
+        return ""
 
 def get_text_from_block(block, blocks):
     """Extrae texto de un bloque y sus hijos"""
-    text = ""
-    if 'Text' in block:
-        text += block['Text'] + " "
-    
-    if 'Relationships' in block:
-        for relationship in block['Relationships']:
-            if relationship['Type'] == 'CHILD':
-                for child_id in relationship['Ids']:
-                    child_block = next((b for b in blocks if b['Id'] == child_id), None)
-                    if child_block and 'Text' in child_block:
-                        text += child_block['Text'] + " "
-    
-    return text.strip()
+    return _como_grafo(blocks).texto(block)
+
+def construir_tabla(table_block, blocks):
+    """Celdas de un bloque TABLE como TablaTextract (el DataFrame se arma al pedirlo)"""
+    grafo = _como_grafo(blocks)
+    textos = {}
+    for cell in grafo.celdas_de_tabla(table_block):
+        fila, columna = grafo.posicion_celda(cell)
+        # La última celda en una misma posición gana, como al llenar la matriz
+        textos[((fila or 1) - 1, (columna or 1) - 1)] = grafo.texto(cell)
+    return TablaTextract((fila, columna, texto) for (fila, columna), texto in textos.items())
+
 def process_table_block(table_block, blocks):
     """Procesa bloques de tabla a DataFrame - CORREGIDO"""
     try:
-        if 'Relationships' not in table_block:
-            return pd.DataFrame()
-        
-        # Encontrar TODAS las celdas de la tabla
-        all_cells = []
-        for relationship in table_block['Relationships']:
-            if relationship['Type'] == 'CHILD':
-                for child_id in relationship['Ids']:
-                    child_block = next((b for b in blocks if b['Id'] == child_id), None)
-                    if child_block and child_block['BlockType'] == 'CELL':
-                        all_cells.append(child_block)
-        
-        if not all_cells:
-            return pd.DataFrame()
-        
-        # Encontrar dimensiones máximas de la tabla
-        max_row = max(cell.get('RowIndex', 0) for cell in all_cells)
-        max_col = max(cell.get('ColumnIndex', 0) for cell in all_cells)
-        
-        if max_row == 0 or max_col == 0:
-            return pd.DataFrame()
-        
-        # Crear matriz para la tabla
-        table_matrix = [['' for _ in range(max_col)] for _ in range(max_row)]
-        
-        # Llenar la matriz con el contenido de las celdas
-        for cell in all_cells:
-            row_idx = cell.get('RowIndex', 1) - 1
-            col_idx = cell.get('ColumnIndex', 1) - 1
-            cell_text = get_text_from_block(cell, blocks)
-            
-            if 0 <= row_idx < max_row and 0 <= col_idx < max_col:
-                table_matrix[row_idx][col_idx] = cell_text
-        
-        # Crear DataFrame
-        df = pd.DataFrame(table_matrix)
-        
-        # Limpiar filas y columnas completamente vacías
-        df = df.replace('', pd.NA)
-        df = df.dropna(how='all').dropna(axis=1, how='all').fillna('')
-        
-        return df
-        
+        return construir_tabla(table_block, blocks).dataframe
     except Exception as e:
+        import pandas as pd
         print(f"Error procesando tabla: {e}")
         return pd.DataFrame()
 
-def process_files_with_textract(files):
-    """Función principal mejorada - CON SOPORTE DE TABLAS PARA IMÁGENES"""
-    results = []
+def _etapa_preproceso(file):
+    """Etapa 0: reduce y recomprime las imágenes antes de analyze_document (los PDF pasan tal cual)"""
+    ctx = {"file": file, "filename": file.name}
+    if es_imagen(file.name):
+        file.seek(0)
+        ctx["bytes_originales"] = file.read()
+        ctx["bytes"], ctx["metricas_preproceso"] = preprocesar_imagen(ctx["bytes_originales"])
+    return ctx
+
+def _etapa_subida(ctx, progreso=None, modo='general'):
+    """Etapa 1: planifica features y sube el archivo a S3 (salvo acierto en caché)"""
+    if "resultado" in ctx:
+        return ctx
+    file = ctx["file"]
+    filename = ctx["filename"]
+    es_pdf = filename.lower().endswith('.pdf')
     
-    for file in files:
-        try:
-            file_bytes = file.read()
-            filename = file.name
-            
-            # Generar key única en S3
-            timestamp = int(time.time())
-            key = f"textract-input/{timestamp}_{filename.replace(' ', '_')}"
-            
-            # Subir a S3
-            s3_uri = upload_bytes_to_s3(file_bytes, key)
-            
-            # Procesar según tipo de archivo
-            if filename.lower().endswith('.pdf'):
-                # Análisis asíncrono para PDF
-                job_id = start_textract_analysis(S3_BUCKET, key)
-                textract_response = wait_for_textract_job(job_id)
-                blocks = textract_response.get('Blocks', [])
+    origen = getattr(file, 's3_origen', None)
+    if es_pdf and origen:
+        return _preparar_origen_s3(ctx, origen, modo)
+    
+    lector = None
+    if es_pdf:
+        # Un solo PdfReader por documento para la sonda, el conteo, la capa de texto
+        # y la división; lee del archivo a demanda, sin cargarlo completo en memoria
+        lector = abrir_lector(file)
+        # Sonda barata con la capa de texto, solo en PDF de una página: en uno de
+        # varias la primera (p. ej. una carta de presentación) no representa al
+        # resto, y recortar TABLES/FORMS perdería las tablas de las demás páginas
+        una_pagina = lector is not None and len(lector.pages) == 1
+        ctx["features"] = planificar_features(modo, texto_primera_pagina(lector) if una_pagina else None)
+        # Los PDF van a S3 en streaming: no se cargan completos en memoria
+        file.seek(0)
+        ctx["tamano"] = _tamano_archivo(file)
+    else:
+        ctx["features"] = planificar_features(modo)
+        # Las imágenes se envían como bytes (ya preprocesados) a analyze_document
+        if "bytes" not in ctx:
+            ctx["bytes"] = file.read()
+        ctx["tamano"] = len(ctx["bytes"])
+    
+    cache = obtener_cache()
+    registro = obtener_registro()
+    if cache is not None or registro is not None:
+        # Clave sobre el archivo original: no depende de los parámetros de preproceso
+        ctx["cache_key"] = (clave_contenido_archivo(file, ctx["features"]) if es_pdf
+                            else clave_contenido(ctx.get("bytes_originales", ctx["bytes"]), ctx["features"]))
+    if cache is not None:
+        cacheado = cache.obtener(ctx["cache_key"])
+        if cacheado is not None:
+            # Acierto: ni S3 ni Textract
+            ctx["resultado"] = {"filename": filename, **cacheado, "features": ctx["features"]}
+            return ctx
+    
+    pendientes = None  # Páginas (base 0) a enviar a Textract; None = todas
+    if es_pdf:
+        ctx["paginas"] = len(lector.pages) if lector else 0
+        if TEXTO_NATIVO_HABILITADO and ctx["paginas"]:
+            pendientes = _separar_paginas_nativas(ctx, lector)
+            if not pendientes:
+                # Todas las páginas tienen capa de texto: ni S3 ni Textract
+                ctx["s3_uri"] = ""
+                return ctx
+            if len(pendientes) == ctx["paginas"]:
+                pendientes = None
             else:
-                # PARA IMÁGENES: usar analyze_document para obtener tablas
-                textract_response = analyze_document_with_tables(file_bytes)
-                blocks = textract_response.get('Blocks', [])
-            
-            # Parsear resultados
-            parsed_data = parse_textract_blocks(blocks)
-            
-            result = {
-                "filename": filename,
-                "s3_uri": s3_uri,
-                "text": parsed_data['text'],
-                "tables": parsed_data['tables'],
-                "forms": parsed_data['forms'],
-                "pages": len([b for b in blocks if b['BlockType'] == 'PAGE']) or 1
-            }
-            
-            results.append(result)
-            
-        except Exception as e:
-            # En caso de error, intentar extracción básica de texto
-            try:
-                # Fallback: extraer solo texto
-                textract_response = detect_document_text(file_bytes)
-                blocks = textract_response.get('Blocks', [])
-                text_lines = [block.get('Text', '') for block in blocks if block['BlockType'] == 'LINE']
-                
-                error_result = {
-                    "filename": file.name,
-                    "s3_uri": "",
-                    "text": '\n'.join(text_lines),
-                    "tables": [],
-                    "forms": {},
-                    "pages": 1
-                }
-                results.append(error_result)
-            except:
-                # Último fallback
-                error_result = {
-                    "filename": file.name,
-                    "s3_uri": "",
-                    "text": f"Error procesando archivo: {str(e)}",
-                    "tables": [],
-                    "forms": {},
-                    "pages": 1
-                }
-                results.append(error_result)
-    
-    return results
+                # Tamaño estimado del sub-PDF; el real se conoce al armarlo
+                ctx["tamano"] = ctx["tamano"] * len(pendientes) // ctx["paginas"]
+                ctx["paginas"] = len(pendientes)
+        ctx["ruta"] = elegir_ruta_pdf(ctx["paginas"], ctx["tamano"])
+        if ctx["ruta"] == "paginas":
+            paginas_pdf = dividir_en_paginas(lector, pendientes)
+            if all(len(pagina) <= LIMITE_BYTES_SINCRONO for pagina in paginas_pdf):
+                # Fan-out síncrono: no hace falta pasar por S3
+                ctx["paginas_pdf"] = paginas_pdf
+                ctx["s3_uri"] = ""
+                return ctx
+            ctx["ruta"] = "asincrona"
+    
+    if es_pdf and registro is not None and _reenganchar_job(ctx, registro):
+        # Job previo (en curso o terminado) para el mismo archivo: sin resubir
+        return ctx
+    
+    # Generar key única en S3
+    timestamp = int(time.time())
+    ctx["key"] = f"textract-input/{timestamp}_{filename.replace(' ', '_')}"
+    
+    # Subir a S3
+    if es_pdf:
+        documento = file
+        if pendientes is not None:
+            # Solo las páginas que necesitan Textract, copiadas desde el mismo lector
+            sub_pdf = construir_pdf(lector, pendientes)
+            ctx["tamano"] = len(sub_pdf)
+            documento = io.BytesIO(sub_pdf)
+        callback = partial(progreso, filename) if progreso else None
+        # upload_fileobj sube desde la posición actual: las sondas anteriores leyeron el archivo
+        documento.seek(0)
+        ctx["s3_uri"], ctx["metricas_subida"] = upload_fileobj_to_s3(documento, ctx["key"], progreso=callback)
+    else:
+        ctx["s3_uri"] = upload_bytes_to_s3(ctx["bytes"], ctx["key"])
+    return ctx
+
+def _preparar_origen_s3(ctx, origen, modo):
+    """PDF que ya está en S3: Textract lo lee de su bucket, sin descargarlo ni resubirlo.
+    
+    Sin los bytes no hay sonda, capa de texto ni fan-out: va directo al job asíncrono.
+    """
+    bucket, key, etag = origen
+    ctx["features"] = planificar_features(modo)
+    ctx["tamano"] = ctx["file"].size
+    ctx["bucket"] = bucket
+    
+    cache = obtener_cache()
+    registro = obtener_registro()
+    if cache is not None or registro is not None:
+        # El ETag cambia si cambia el contenido del objeto
+        ctx["cache_key"] = clave_contenido(f"s3://{bucket}/{key}#{etag}".encode('utf-8'), ctx["features"])
+    if cache is not None:
+        cacheado = cache.obtener(ctx["cache_key"])
+        if cacheado is not None:
+            ctx["resultado"] = {"filename": ctx["filename"], **cacheado, "features": ctx["features"]}
+            return ctx
+    if registro is not None and _reenganchar_job(ctx, registro):
+        return ctx
+    
+    ctx["key"] = key
+    ctx["s3_uri"] = f"s3://{bucket}/{key}"
+    return ctx
+
+def _reenganchar_job(ctx, registro):
+    """Reutiliza un job asíncrono registrado para el mismo contenido si sigue vigente"""
+    previo = registro.buscar(ctx["cache_key"])
+    if previo is None or previo['solo_texto'] != (not ctx["features"]):
+        return False
+    try:
+        response = obtener_resultados_job(previo['job_id'], previo['solo_texto'], MaxResults=1)
+    except Exception:
+        # JobId desconocido o resultados ya expirados en Textract
+        registro.actualizar_estado(previo['job_id'], 'FAILED')
+        return False
+    if response.get('JobStatus') == 'FAILED':
+        registro.actualizar_estado(previo['job_id'], 'FAILED')
+        return False
+    
+    ctx["key"] = previo['s3_key']
+    ctx["job_id"] = previo['job_id']
+    ctx["s3_uri"] = f"s3://{ctx.get('bucket', S3_BUCKET)}/{previo['s3_key']}"
+    return True
+
+def _separar_paginas_nativas(ctx, lector):
+    """Pre-paso de capa de texto: extrae localmente las páginas nativas.
+    
+    Devuelve los índices (base 0) de las páginas escaneadas / estructuradas que
+    necesitan Textract; lista vacía si ninguna lo necesita.
+    """
+    textos = extraer_capa_texto(lector)
+    rutas = planificar_paginas(
+        textos,
+        necesita_tablas='TABLES' in ctx["features"],
+        necesita_formularios='FORMS' in ctx["features"]
+    )
+    ctx["rutas_paginas"] = rutas
+    ctx["textos_nativos"] = {n: texto for n, (texto, ruta) in enumerate(zip(textos, rutas), start=1)
+                             if ruta == 'texto_nativo'}
+    pendientes = [indice for indice, ruta in enumerate(rutas) if ruta == 'textract']
+    if pendientes and len(pendientes) < len(rutas):
+        # Página n del sub-PDF -> página original
+        ctx["mapa_paginas"] = {n: indice + 1 for n, indice in enumerate(pendientes, start=1)}
+    return pendientes
+
+def _etapa_analisis(ctx):
+    """Etapa 2: ejecuta Textract según el tipo de archivo"""
+    if "resultado" in ctx:
+        return ctx
+    
+    if ctx.get("rutas_paginas") and "textract" not in ctx["rutas_paginas"]:
+        ctx["lotes"] = []
+    elif "paginas_pdf" in ctx:
+        # PDF pequeño: una llamada síncrona por página, en paralelo
+        textract_response = analizar_pdf_por_paginas(ctx.pop("paginas_pdf"), feature_types=ctx["features"])
+        ctx["lotes"] = [textract_response['Blocks']]
+    elif ctx["filename"].lower().endswith('.pdf'):
+        # Análisis asíncrono para PDF
+        solo_texto = not ctx["features"]
+        registro = obtener_registro()
+        job_id = ctx.get("job_id")
+        if job_id is None:
+            job_id = start_textract_analysis(ctx.get("bucket", S3_BUCKET), ctx["key"], ctx["features"])
+            if registro is not None and "cache_key" in ctx:
+                registro.registrar(ctx["cache_key"], ctx["key"], job_id, solo_texto)
+        paginas_estimadas = ctx.get("paginas") or max(1, ctx["tamano"] // 100_000)
+        primera_respuesta = wait_for_textract_job(job_id, paginas_estimadas, solo_texto=solo_texto)
+        ctx["estado_job"] = primera_respuesta.get('JobStatus', 'UNKNOWN')
+        if registro is not None:
+            registro.actualizar_estado(job_id, ctx["estado_job"])
+        if ctx["estado_job"] == 'FAILED':
+            # Sin bloques que parsear: que el archivo siga por el fallback
+            raise Exception(f"Job de Textract {job_id} falló: {primera_respuesta.get('StatusMessage', 'sin detalle')}")
+        # Las páginas restantes se descargan mientras la etapa de parseo consume
+        if TEXTRACT_STREAMING_JSON:
+            ctx["lotes"] = iterar_lotes_bloques_streaming(job_id, primera_respuesta, solo_texto=solo_texto)
+        else:
+            ctx["lotes"] = iterar_lotes_bloques(job_id, primera_respuesta, solo_texto=solo_texto)
+    else:
+        # PARA IMÁGENES: usar analyze_document para obtener tablas
+        inicio = time.perf_counter()
+        textract_response = analyze_document_with_tables(ctx["bytes"], ctx["features"])
+        if "metricas_preproceso" in ctx:
+            ctx["metricas_preproceso"]["segundos_textract"] = round(time.perf_counter() - inicio, 3)
+        ctx["lotes"] = [textract_response.get('Blocks', [])]
+    return ctx
+
+def _etapa_parseo(ctx):
+    """Etapa 3: parsea los bloques al formato de resultado"""
+    if "resultado" in ctx:
+        return ctx["resultado"]
+    
+    parsed_data = parse_textract_stream(ctx.pop("lotes"), conservar_bloques=TEXTRACT_CONSERVAR_BLOQUES)
+    
+    result = {
+        "filename": ctx["filename"],
+        "s3_uri": ctx["s3_uri"],
+        "text": parsed_data['text'],
+        "tables": parsed_data['tables'],
+        "forms": parsed_data['forms'],
+        "pages": parsed_data['pages'] or 1,
+        "features": ctx["features"]
+    }
+    if "rutas_paginas" in ctx:
+        _combinar_texto_nativo(result, parsed_data, ctx)
+    if "metricas_subida" in ctx:
+        result["metricas_subida"] = ctx["metricas_subida"]
+    if "metricas_preproceso" in ctx:
+        result["metricas_preproceso"] = ctx["metricas_preproceso"]
+    if "bloques" in parsed_data:
+        # Bloques por página en formato columnar (geometría, confianza); no van a la caché
+        result["bloques"] = parsed_data["bloques"]
+    
+    cache = obtener_cache()
+    if cache is not None and "cache_key" in ctx and _resultado_cacheable(ctx, parsed_data):
+        cache.guardar(ctx["cache_key"], result)
+    return result
+
+def _resultado_cacheable(ctx, parsed_data):
+    """Solo se cachean resultados completos: job terminado con éxito y parseo sin errores"""
+    # Las rutas síncronas no tienen estado de job: si llegaron hasta aquí, terminaron bien
+    estado = ctx.get("estado_job", 'SUCCEEDED')
+    return estado in ('SUCCEEDED', 'PARTIAL_SUCCESS') and not parsed_data['errores']
+
+def _combinar_texto_nativo(result, parsed_data, ctx):
+    """Intercala, en orden de página original, el texto nativo y el de Textract"""
+    rutas = ctx["rutas_paginas"]
+    mapa = ctx.get("mapa_paginas")
+    textos_textract = {(mapa[n] if mapa else n): texto
+                       for n, texto in parsed_data['textos_pagina'].items()}
+    textos = []
+    for numero in range(1, len(rutas) + 1):
+        texto = ctx["textos_nativos"].get(numero) or textos_textract.get(numero, '')
+        if texto:
+            textos.append(texto)
+    result["text"] = '\n'.join(textos)
+    result["pages"] = len(rutas)
+    result["rutas_paginas"] = rutas
+    result["resumen_rutas"] = {
+        'texto_nativo': rutas.count('texto_nativo'),
+        'textract': rutas.count('textract')
+    }
+
+def _resultado_fallback(valor, error, etapa):
+    """Reemplazo cuando una etapa falla para un archivo; corre en el worker de esa etapa.
+    
+    El resultado degradado sigue por el pipeline: antes del parseo viaja como
+    ctx["resultado"] (las etapas siguientes lo dejan pasar, igual que un acierto
+    de caché) y así también recibe el enriquecimiento.
+    """
+    if etapa == "enriquecimiento":
+        # El resultado de Textract ya es válido, solo falló el enriquecimiento
+        return valor
+    
+    ctx = valor if isinstance(valor, dict) else {"file": valor, "filename": valor.name}
+    resultado = _texto_de_respaldo(ctx["file"], ctx.get("bytes"), error)
+    if etapa == "parseo":
+        return resultado
+    ctx["resultado"] = resultado
+    return ctx
+
+def _texto_de_respaldo(file, file_bytes, error):
+    """Solo texto con detect_document_text, o el error si tampoco funciona"""
+    try:
+        # Fallback: extraer solo texto
+        if file_bytes is None:
+            file.seek(0)
+            file_bytes = file.read()
+        textract_response = detect_document_text(file_bytes)
+        blocks = textract_response.get('Blocks', [])
+        text_lines = [block.get('Text', '') for block in blocks if block['BlockType'] == 'LINE']
+        
+        return {
+            "filename": file.name,
+            "s3_uri": "",
+            "text": '\n'.join(text_lines),
+            "tables": [],
+            "forms": {},
+            "pages": 1
+        }
+    except:
+        # Último fallback
+        return {
+            "filename": file.name,
+            "s3_uri": "",
+            "text": f"Error procesando archivo: {str(error)}",
+            "tables": [],
+            "forms": {},
+            "pages": 1
+        }
+
+def crear_pipeline_textract(max_en_vuelo=None, enriquecer=None, workers=None, progreso_subida=None,
+                            modo='general', sjf=None):
+    """Arma el pipeline preproceso -> subida -> análisis -> parseo -> enriquecimiento.
+    
+    `modo` es el modo de procesamiento de app.py y decide qué FeatureTypes se piden.
+    `progreso_subida(filename, bytes_transferidos, total)` informa el avance de las subidas multipart.
+    `sjf` despacha primero los documentos de menor costo estimado (por defecto SJF_HABILITADO).
+    """
+    max_en_vuelo = max_en_vuelo or MAX_EN_VUELO_DEFAULT
+    workers = workers or {}
+    etapas = [
+        # Pillow libera el GIL al decodificar/redimensionar: las imágenes se procesan en paralelo
+        Etapa("preproceso", _etapa_preproceso, workers.get("preproceso", IMAGEN_PREPROCESO_WORKERS)),
+        Etapa("subida", partial(_etapa_subida, progreso=progreso_subida, modo=modo), workers.get("subida", 4)),
+        # Los jobs de Textract dominan la latencia: un worker por documento en vuelo
+        Etapa("analisis", _etapa_analisis, workers.get("analisis", max_en_vuelo)),
+        Etapa("parseo", _etapa_parseo, workers.get("parseo", 2)),
+        Etapa("enriquecimiento", enriquecer or (lambda result: result), workers.get("enriquecimiento", 2)),
+    ]
+    planificador = None
+    if SJF_HABILITADO if sjf is None else sjf:
+        planificador = PlanificadorSJF(partial(estimar_costo, fanout_max_paginas=FANOUT_MAX_PAGINAS))
+    return PipelineEtapas(etapas, max_en_vuelo=max_en_vuelo, al_fallar=_resultado_fallback,
+                          planificador=planificador)
+
+def _anotar_planificacion(pipeline, idx, result):
+    """Agrega al resultado su costo estimado, espera en cola y tiempo de servicio"""
+    tiempos = pipeline.tiempos.get(idx)
+    if not isinstance(result, dict) or tiempos is None:
+        return result
+    planificacion = {
+        'espera_cola': round(tiempos['espera_cola'], 3),
+        'servicio': round(tiempos['servicio'], 3)
+    }
+    if pipeline.planificador is not None:
+        planificacion['costo_estimado'] = round(pipeline.planificador.costos.get(idx, 0.0), 2)
+    result['planificacion'] = planificacion
+    return result
+
+def process_files_with_textract(files, max_en_vuelo=None, enriquecer=None, progreso_subida=None, modo='general'):
+    """Función principal - pipeline concurrente por etapas, resultados en orden de entrada"""
+    pipeline = crear_pipeline_textract(max_en_vuelo, enriquecer, progreso_subida=progreso_subida, modo=modo)
+    resultados = pipeline.ejecutar(files)
+    return [_anotar_planificacion(pipeline, idx, result) for idx, result in enumerate(resultados)]
+
+def iterar_archivos_con_textract(files, max_en_vuelo=None, enriquecer=None, progreso_subida=None, modo='general'):
+    """Genera (indice, resultado) por documento en cuanto termina, sin esperar al lote completo"""
+    pipeline = crear_pipeline_textract(max_en_vuelo, enriquecer, progreso_subida=progreso_subida, modo=modo)
+    for idx, result in pipeline.iterar(files):
+        yield idx, _anotar_planificacion(pipeline, idx, result)
+
+def resumen_planificacion(resultados):
+    """Espera en cola y servicio medios de un lote ya procesado"""
+    tiempos = {
+        idx: result['planificacion'] for idx, result in enumerate(resultados)
+        if isinstance(result, dict) and 'planificacion' in result
+    }
+    return resumen_tiempos(tiempos)
+
+class InfoTabla:
+    """Entrada de extract_tables_from_result: `dataframe` se construye (una vez) al pedirlo"""
+    
+    __slots__ = ('index', 'rows', 'columns', 'tabla')
+    
+    def __init__(self, index, tabla):
+        self.index = index
+        self.rows = tabla.filas
+        self.columns = tabla.columnas
+        self.tabla = tabla
+    
+    @property
+    def dataframe(self):
+        return self.tabla.dataframe
 
 def extract_tables_from_result(result):
-    """Extrae y formatea tablas de un resultado - MEJORADO"""
-    tables_data = []
-    
-    for i, table_df in enumerate(result.get('tables', [])):
-        # Verificar que el DataFrame no esté vacío y tenga contenido real
-        if (not table_df.empty and 
-            table_df.shape[0] > 0 and 
-            table_df.shape[1] > 0 and
-            not table_df.isna().all().all()):
-            
-            # Limpiar el DataFrame
-            table_df_clean = table_df.replace('', pd.NA).dropna(how='all').dropna(axis=1, how='all').fillna('')
-            
-            # Solo incluir si después de limpiar todavía tiene contenido
-            if not table_df_clean.empty and table_df_clean.shape[0] > 0 and table_df_clean.shape[1] > 0:
-                tables_data.append({
-                    'index': i + 1,
-                    'dataframe': table_df_clean,
-                    'rows': len(table_df_clean),
-                    'columns': len(table_df_clean.columns)
-                })
-    
-    return tables_data
\ No newline at end of file
+    """Extrae y formatea tablas de un resultado - MEJORADO
+    
+    Las tablas ya vienen limpias (TablaTextract); filas y columnas se conocen sin
+    construir el DataFrame, que se arma y memoiza en el primer acceso.
+    """
+    tables = result.get('tables', [])
+    if any(not isinstance(tabla, TablaTextract) for tabla in tables):
+        # Resultados anteriores con DataFrames: convertir una sola vez
+        tables = result['tables'] = [como_tabla(tabla) for tabla in tables]
+    
+    return [InfoTabla(i + 1, tabla) for i, tabla in enumerate(tables) if not tabla.empty]
\ No newline at end of file